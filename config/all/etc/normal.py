@@ -3,19 +3,19 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
-from etc import etc_normal
+from sweep import sweep
+from etc import etc_normal_grid
+from etc import etc_normal_exact
 
 mu1 = 0
 mu2s = [0.01 * d for d in range(0,101)]
 ms = [25, 50, 75, 100, 'optimal']
 n = 1000
 numsim = 1000
+workers = os.cpu_count()
+analytic = True
 
-def etc_norm_plot(mu1, mu2s, m, n, numsim):
-    regrets = []
-    for mu2 in mu2s:
-        regrets.append(etc_normal(mu1, mu2, m, n, numsim))
-
+def etc_norm_plot(mu1, mu2s, m, regrets):
     if m == 'optimal':
         lbl = 'optimal'
     else:
@@ -40,8 +40,13 @@ def etc_norm_plot(mu1, mu2s, m, n, numsim):
     plt.savefig(results_dir + file_name)
 
 def experiment():
-    for m in ms:
-        etc_norm_plot(mu1, mu2s, m, n, numsim)
+    if analytic:
+        regrets = [[etc_normal_exact(mu1, mu2, m, n)[0] for m in ms] for mu2 in mu2s]
+    else:
+        # one simulation per gap gives the regret of every exploration rate
+        regrets = sweep([(etc_normal_grid, (mu1, mu2, ms, n, numsim)) for mu2 in mu2s], workers)
+    for i, m in enumerate(ms):
+        etc_norm_plot(mu1, mu2s, m, [regret[i] for regret in regrets])
 
 if __name__ == "__main__":
     experiment()
\ No newline at end of file
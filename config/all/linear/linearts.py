@@ -3,20 +3,22 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from lints import lin_ts
 
 vs = [0.01 * d for d in range(-20,21)]
 a_s = [[0.1, -0.1], [0.1, -0.2], [0.1, 0.2]]
 n = 1000
 numsim = 1000
+workers = os.cpu_count()
 
 def lin_ts_plot(vs, a, n, numsim):
     regrets = []
     variance = []
 
-    for v in vs:
-        result = lin_ts(v, a, n, numsim)
+    results = sweep_shared([lin_ts], [(v, a, n, numsim) for v in vs], workers)[0]
 
+    for result in results:
         regrets.append(result[0])
         variance.append(result[1])
 
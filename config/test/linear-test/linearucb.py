@@ -3,6 +3,7 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from linucb import lin_ucb
 
 # test with only 20 simulations and one arm vector
@@ -10,14 +11,15 @@ vs = [0.01 * d for d in range(-50,51)]
 a_s = [[0.1, -0.1]]#, [0.1, -0.2], [0.1, 0.2]]
 n = 1000
 numsim = 20
+workers = os.cpu_count()
 
 def lin_ucb_plot(vs, a, n, numsim):
     regrets = []
     variance = []
 
-    for v in vs:
-        result = lin_ucb(v, a, n, numsim)
+    results = sweep_shared([lin_ucb], [(v, a, n, numsim) for v in vs], workers)[0]
 
+    for result in results:
         regrets.append(result[0])
         variance.append(result[1])
 
@@ -3,6 +3,7 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from ts import thompson_bernoulli
 
 # test with only 20 simulations and one prior
@@ -10,16 +11,16 @@ mu1 = 0.5
 mu2s = [0.01 * d for d in range(0,101)]
 n = 1000
 numsim = 20
+workers = os.cpu_count()
 priors_lst = [[(1, 1), (1, 1)]]#, [(1, 1), (1, 3)]]#, [(10, 10), (10, 10)], [(10, 10), (10, 30)]]
 
 def ts_norm_plot(mu1, mu2s, priors, n, numsim):
     regrets = []
     variance = []
 
-    for mu2 in mu2s:
-        true_mus = [mu1, mu2]
-        result = thompson_bernoulli(true_mus, priors, n, numsim)
+    results = sweep_shared([thompson_bernoulli], [([mu1, mu2], priors, n, numsim) for mu2 in mu2s], workers)[0]
 
+    for result in results:
         regrets.append(result[0])
         variance.append(result[1])
 
@@ -3,6 +3,7 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from ts import thompson_normal
 
 # test with only 20 simulations and one prior
@@ -11,16 +12,17 @@ mu1_sig_var, mu2_sig_var = 1, 1
 mu2s = [0.01 * d for d in range(0,101)]
 n = 1000
 numsim = 20
+workers = os.cpu_count()
 priors_lst = [[(0, 1), (0, 1)]]#, [(0, 1), (0.5, 1)]]#, [(0.5, 1), (0, 1)], [(0, 0.1), (0.5, 0.1)], [(0.5, 0.1), (0, 0.1)]]
 
 def ts_norm_plot(mu1, mu2s, priors, n, numsim):
     regrets = []
     variance = []
 
-    for mu2 in mu2s:
-        true_mus = [(mu1, mu1_sig_var), (mu2, mu2_sig_var)]
-        result = thompson_normal(true_mus, priors, n, numsim)
+    true_mus = [[(mu1, mu1_sig_var), (mu2, mu2_sig_var)] for mu2 in mu2s]
+    results = sweep_shared([thompson_normal], [(true_mu, priors, n, numsim) for true_mu in true_mus], workers)[0]
 
+    for result in results:
         regrets.append(result[0])
         variance.append(result[1])
 
@@ -3,6 +3,7 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from ucb import ucb_bernoulli
 from ucb import moss_bernoulli
 from ucb import klucb_bernoulli
@@ -12,28 +13,29 @@ mu1 = .5
 mu2s = [0.01 * d for d in range(20, 81)]
 n = 1000
 numsim = 20
+workers = os.cpu_count()
 
 def ucb_bern_plot(mu1, mu2s, n, numsim):
     regrets_ucb_bernoulli = []
     regrets_moss_bernoulli = []
-    #regrets_klucb_bernoulli = []
+    regrets_klucb_bernoulli = []
 
     variance_ucb_bernoulli = []
     variance_moss_bernoulli = []
-    #variance_klucb_bernoulli = []
+    variance_klucb_bernoulli = []
 
-    for mu in mu2s:
-        ucb = ucb_bernoulli(0.5, mu, n, numsim)
-        moss = moss_bernoulli(0.5, mu, n, numsim)
-        #klucb = klucb_bernoulli(0.5, mu, n, numsim)
-        
+    algorithms = [ucb_bernoulli, moss_bernoulli, klucb_bernoulli]
+    # every algorithm at a gap reads the same rewards, so their differences are not buried in sampling noise
+    results = sweep_shared(algorithms, [(0.5, mu, n, numsim) for mu in mu2s], workers, common = True)
+
+    for ucb, moss, klucb in zip(*results):
         regrets_ucb_bernoulli.append(ucb[0])
         regrets_moss_bernoulli.append(moss[0])
-        #regrets_klucb_bernoulli.append(klucb[0])
+        regrets_klucb_bernoulli.append(klucb[0])
         
         variance_ucb_bernoulli.append(ucb[1])
         variance_moss_bernoulli.append(moss[1])
-        #variance_klucb_bernoulli.append(klucb[1])
+        variance_klucb_bernoulli.append(klucb[1])
 
     current_dir = os.getcwd()
     parent = os.path.join(current_dir, os.pardir)
@@ -48,20 +50,23 @@ def ucb_bern_plot(mu1, mu2s, n, numsim):
     fig, (ax1, ax2) = plt.subplots(nrows=1, ncols = 2, figsize=(16,6))
 
     ax1.plot(mu2s, regrets_ucb_bernoulli, label = r'UCB($\delta$)', color = 'red')
-    #ax1.plot(mu2s, regrets_klucb_bernoulli, label = 'KL-UCB', color = 'blue')
+    ax1.plot(mu2s, regrets_klucb_bernoulli, label = 'KL-UCB', color = 'blue')
     ax1.plot(mu2s, regrets_moss_bernoulli, label = 'MOSS', color = 'black')
     ax1.set_xlabel((r'$\mu_1 - \mu_2$'))
     ax1.set_ylabel('regret')
     ax1.legend()
 
     ax2.plot(mu2s, variance_ucb_bernoulli, label = r'UCB($\delta$)', color = 'red')
-    #ax2.plot(mu2s, variance_klucb_bernoulli, label = 'KL-UCB', color = 'blue')
+    ax2.plot(mu2s, variance_klucb_bernoulli, label = 'KL-UCB', color = 'blue')
     ax2.plot(mu2s, variance_moss_bernoulli, label = 'MOSS', color = 'black')
     ax2.set_xlabel((r'$\mu_1 - \mu_2$'))
     ax2.set_ylabel('variance')
     ax2.legend()
     plt.savefig(results_dir + file_name)
 
-if __name__ == "__main__":
+def experiment():
     ucb_bern_plot(mu1, mu2s, n, numsim)
 
+if __name__ == "__main__":
+    experiment()
+
@@ -3,6 +3,7 @@ import os
 import sys
 
 sys.path.insert(0, 'src')
+from sweep import sweep_shared
 from ucb import ucb_normal
 from ucb import asymp_ucb_normal
 from ucb import moss_normal
@@ -12,6 +13,7 @@ mu1 = 0
 mu2s = [0.01 * d for d in range(0, 101)]
 n = 1000
 numsim = 20
+workers = os.cpu_count()
 
 def ucb_norm_plot(mu1, mu2s, n, numsim):
     regrets_ucb_normal = []
@@ -21,11 +23,11 @@ def ucb_norm_plot(mu1, mu2s, n, numsim):
     variance_ucb_normal = []
     variance_asymp_ucb_normal = []
     variance_moss_normal = []
-    for mu in mu2s:
-        ucb = ucb_normal(0, mu, n, numsim)
-        asymp_ucb = asymp_ucb_normal(0, mu, n, numsim)
-        moss = moss_normal(0, mu, n, numsim)
-        
+    algorithms = [ucb_normal, asymp_ucb_normal, moss_normal]
+    # every algorithm at a gap reads the same rewards, so their differences are not buried in sampling noise
+    results = sweep_shared(algorithms, [(0, mu, n, numsim) for mu in mu2s], workers, common = True)
+
+    for ucb, asymp_ucb, moss in zip(*results):
         regrets_ucb_normal.append(ucb[0])
         regrets_asymp_ucb_normal.append(asymp_ucb[0])
         regrets_moss_normal.append(moss[0])
@@ -63,5 +65,8 @@ def ucb_norm_plot(mu1, mu2s, n, numsim):
     ax2.legend()
     plt.savefig(results_dir + file_name)
 
+def experiment():
+    ucb_norm_plot(mu1, mu2s, n, numsim)
+
 if __name__ == "__main__":
-    ucb_norm_plot(mu1, mu2s, n, numsim)
\ No newline at end of file
+    experiment()
\ No newline at end of file
@@ -1,17 +1,74 @@
-
 #!/usr/bin/env python
 
 import sys
 import os
+import time
+import argparse
+import traceback
+import importlib.util
 from pathlib import Path
-import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.insert(0, 'src')
 
 config_root = Path(__file__).resolve().parent / "config"
 
 
-def main(targets):
+def warm_up():
+    # import the heavy modules once per worker so every config it runs starts warm
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    import numpy
+    from matplotlib import pyplot
+
+
+def run_config(path, workers):
+    # load the config in this process and run its experiment, returning its exit code and wall time
+    from matplotlib import pyplot as plt
+
+    start = time.time()
+    plt.close('all')
+    try:
+        name = "config_" + "_".join(Path(path).relative_to(config_root).with_suffix("").parts).replace("-", "_")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        # share the cores between the configs that run at the same time
+        module.workers = workers
+        module.experiment()
+        code = 0
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        plt.close('all')
+    return code, time.time() - start
+
+
+def main(targets, jobs, queue=None, checkpoint=None, interval=60, memory=None, cache=None, cache_size=None,
+         store=None, render_only=False):
+    if memory:
+        # memory budget of every vectorized simulation, see src/budget.py
+        os.environ["BANDIT_MEMORY"] = memory
+    if queue:
+        # sweeps of every config go through the shared job queue, see src/jobqueue.py
+        os.environ["BANDIT_QUEUE"] = os.path.abspath(queue)
+    if checkpoint:
+        # sweeps save finished points and resume from them, see src/sweep.py
+        os.environ["BANDIT_CHECKPOINT"] = os.path.abspath(checkpoint)
+        os.environ["BANDIT_CHECKPOINT_INTERVAL"] = str(interval)
+    if cache:
+        # sweeps read back every point that any earlier run computed, see src/cache.py
+        os.environ["BANDIT_CACHE"] = os.path.abspath(cache)
+    if cache_size:
+        os.environ["BANDIT_CACHE_SIZE"] = cache_size
+    if store:
+        # sweeps append their results to this store, see src/store.py
+        os.environ["BANDIT_STORE"] = os.path.abspath(store)
+    if render_only:
+        # sweeps read their results back from the store and only the figures are drawn
+        os.environ["BANDIT_RENDER_ONLY"] = "1"
+
     if 'test' in targets:
         configs = (config_root / "test").rglob("*.py")
     elif 'all' in targets:
@@ -25,14 +82,32 @@ def main(targets):
     elif 'linear' in targets:
         configs = (config_root / "all" /"linear").rglob("*py")
 
-    for x in configs:   
-        subprocess.call(
-            args=[
-                "python",
-                str(x)
-            ]
-        )
+    configs = sorted(str(x) for x in configs)
+    jobs = max(1, min(jobs, len(configs)))
+    workers = max(1, (os.cpu_count() or 1) // jobs)
+
+    codes = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_up) as pool:
+        futures = {pool.submit(run_config, x, workers): x for x in configs}
+        for future in as_completed(futures):
+            code, wall_time = future.result()
+            codes[futures[future]] = code
+            print("{}: exit code {} in {:.1f}s".format(futures[future], code, wall_time), flush=True)
+
+    return max(codes.values(), default=0)
 
 if __name__ == '__main__':
-    targets = sys.argv[1:]
-    main(targets)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("targets", nargs="*")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of configs run at the same time")
+    parser.add_argument("--queue", help="SQLite job queue shared with workers on other hosts")
+    parser.add_argument("--checkpoint", help="directory where sweeps save finished points to resume from")
+    parser.add_argument("--checkpoint-interval", type=float, default=60, help="seconds between checkpoints")
+    parser.add_argument("--memory", help="memory budget of every simulation, e.g. 512M or 4G")
+    parser.add_argument("--cache", help="directory of the result cache shared by every run")
+    parser.add_argument("--cache-size", help="most disk space the result cache may use, e.g. 512M or 4G")
+    parser.add_argument("--store", help="directory of the results store, defaults to Results/store")
+    parser.add_argument("--render-only", action="store_true", help="redraw the figures from the results store")
+    args = parser.parse_args()
+    sys.exit(main(args.targets, args.jobs, args.queue, args.checkpoint, args.checkpoint_interval, args.memory,
+                  args.cache, args.cache_size, args.store, args.render_only))
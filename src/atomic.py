@@ -0,0 +1,27 @@
+import os
+
+def write(path, dump):
+    """
+    Writes a file through a temporary file next to it that then replaces the file, so a kill while writing leaves
+    the previous file intact and readers never see half of one. The temporary name holds the process id, so
+    processes writing the same path do not clobber each other's temporary file.
+
+    Args:
+        path (str): path of the file.
+        dump: function that writes the contents to the binary file object it is given.
+
+    Returns:
+        The number of bytes written.
+    """
+
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(temporary, 'wb') as file:
+            dump(file)
+        written = os.path.getsize(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return written
@@ -0,0 +1,47 @@
+import os
+
+import rng
+
+# bytes a vectorized simulation may hold at once when no budget is given
+DEFAULT = 2**30
+
+_units = {'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+def limit(memory = None):
+    """
+    Finds the memory budget of a vectorized simulation.
+
+    Args:
+        memory: budget in bytes, or a string such as '512M' or '4G', None to read the BANDIT_MEMORY environment
+            variable or use DEFAULT.
+
+    Returns:
+        The budget in bytes.
+    """
+
+    if memory is None:
+        memory = os.environ.get('BANDIT_MEMORY', DEFAULT)
+    if isinstance(memory, str):
+        memory = memory.strip().upper().rstrip('B')
+        if memory[-1:] in _units:
+            return int(float(memory[:-1]) * _units[memory[-1]])
+        return int(float(memory))
+    return int(memory)
+
+def split(numsim, per_sim, memory = None):
+    """
+    Splits simulations into chunks that each fit the memory budget. Chunks hold whole blocks of rng.BLOCK
+    simulations, so a chunk that runs with the seed rng.Chunk(seed, start) draws exactly the numbers its simulations
+    draw in a run without chunks. A single block is the smallest chunk, even when it exceeds the budget.
+
+    Args:
+        numsim (int): number of simulations.
+        per_sim (int): bytes one simulation holds.
+        memory: memory budget, see limit.
+
+    Returns:
+        List of (start, count) tuples.
+    """
+
+    size = max(1, limit(memory) // max(1, per_sim * rng.BLOCK)) * rng.BLOCK
+    return [(start, min(size, numsim - start)) for start in range(0, numsim, size)]
@@ -0,0 +1,176 @@
+import os
+import sys
+import pickle
+import hashlib
+import inspect
+
+import atomic
+import budget
+
+# bytes the result cache may hold on disk when no size is given
+DEFAULT_SIZE = 2**30
+
+# share of the size that eviction frees the cache down to, so a full cache is not listed again on the next write
+LOW_WATER = 0.9
+
+# source version of every module, computed once per process
+_versions = {}
+
+def version(func):
+    """
+    Finds the source version of a simulation function, a hash of the source of its module and of the modules it
+    uses from the same directory, e.g. rng and kl for ucb. Editing any of them gives every function of the module a
+    new version, so results cached before the edit are never read back.
+
+    Args:
+        func: simulation function.
+
+    Returns:
+        Hex digest of the sources.
+    """
+
+    module = sys.modules[func.__module__]
+    if module.__name__ not in _versions:
+        directory = os.path.dirname(os.path.abspath(module.__file__))
+        modules = {module.__name__: module}
+        for value in vars(module).values():
+            used = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+            path = getattr(used, '__file__', None)
+            if path and os.path.dirname(os.path.abspath(path)) == directory:
+                modules[used.__name__] = used
+        digest = hashlib.sha1()
+        for name in sorted(modules):
+            digest.update(name.encode())
+            digest.update(inspect.getsource(modules[name]).encode())
+        _versions[module.__name__] = digest.hexdigest()
+    return _versions[module.__name__]
+
+def key(func, args, seed):
+    """
+    Addresses the result of a task by its function, the source version of the function, its arguments, which
+    include the number of simulations, and its seed.
+
+    Args:
+        func: simulation function.
+        args: arguments of the function.
+        seed: seed of the task.
+
+    Returns:
+        Hex digest that is the same in every process and on every host.
+    """
+
+    return hashlib.sha1(pickle.dumps((func.__module__, func.__qualname__, version(func), args, seed))).hexdigest()
+
+class Cache:
+    """
+    Results of simulation tasks kept on disk, one file per task named after its key, so every sweep that runs a
+    task already run by any earlier sweep reads its result back instead. Reading a result marks it as recently
+    used, and once the files hold more than size bytes the least recently used ones are removed. The directory is
+    only listed on the first write and whenever the running total of the files exceeds the size, and eviction
+    frees it down to LOW_WATER of the size, so writing N results does not list it N times.
+
+    Args:
+        directory: directory of the cache files, None to keep nothing.
+        size: most bytes the files may hold, in bytes or as a string such as '512M', see budget.limit.
+    """
+
+    def __init__(self, directory, size = DEFAULT_SIZE):
+        self.directory = directory
+        self.size = budget.limit(size)
+        self.total = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def load(self, key):
+        """
+        Reads back a cached result.
+
+        Args:
+            key: key of the task, see key.
+
+        Returns:
+            Tuple of the result and the regret of every simulation, None if they were not kept, or None if the task
+            is not in the cache.
+        """
+
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as file:
+                entry = pickle.load(file)
+            os.utime(self._path(key))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def store(self, key, result, regrets = None):
+        """
+        Writes the result of a task, through a temporary file so a kill while writing never leaves a broken entry,
+        and evicts the least recently used entries beyond the size of the cache.
+
+        Args:
+            key: key of the task, see key.
+            result: result of the task, e.g. its average regret and regret variance.
+            regrets: array with the regret of every simulation, None to keep only the result.
+        """
+
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok = True)
+        if self.total is None:
+            self.evict()
+        try:
+            replaced = os.path.getsize(self._path(key))
+        except OSError:
+            replaced = 0
+        entry = (result, None if regrets is None else regrets.copy())
+        written = atomic.write(self._path(key), lambda file: pickle.dump(entry, file))
+
+        # other processes may write to the same directory, evict lists it again to correct the total
+        self.total += written - replaced
+        if self.total > self.size:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the rest fit LOW_WATER of the size of the cache if they do not
+        fit the size, and finds the total size of the entries that are left.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        limit = self.size if total <= self.size else LOW_WATER * self.size
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self.total = total
+
+def open_cache(directory = None, size = None):
+    """
+    Opens the result cache from the BANDIT_CACHE and BANDIT_CACHE_SIZE environment variables unless they are given.
+
+    Args:
+        directory: directory of the cache files, None to read BANDIT_CACHE and keep nothing if it is not set.
+        size: most bytes the files may hold, None to read BANDIT_CACHE_SIZE or use DEFAULT_SIZE.
+
+    Returns:
+        The cache.
+    """
+
+    directory = directory or os.environ.get('BANDIT_CACHE')
+    if size is None:
+        size = os.environ.get('BANDIT_CACHE_SIZE', DEFAULT_SIZE)
+    return Cache(directory, size)
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+
+import numpy as np
+
+import budget
+import rng
+
+# pulls of one arm drawn at once for every simulation of a table
+DEPTH = 256
+
+# bytes one simulation holds per arm while reading a table, about two windows of noise
+STATE = 16 * DEPTH
+
+class RewardTable:
+    """
+    Common random numbers for the rewards of simulations. The noise of the j-th pull of arm k in simulation i is
+    fixed by the seed, so every algorithm that reads the same table sees the same reward for the same pull, and the
+    differences between algorithms are not buried in the noise of independent draws. Normal rewards are the mean
+    plus standard normal noise and bernoulli rewards compare uniform noise to the mean, so the same table serves
+    every gap of a sweep as well.
+
+    The noise is drawn in bulk, DEPTH pulls of every arm for a whole block of rng.BLOCK simulations at a time, from
+    a stream derived from the seed and the (point, block, kind, window) tuple. A window never depends on how many
+    simulations run or in which chunk they run, and windows beyond the memory budget are dropped least recently used
+    first and drawn again when they are needed.
+
+    Args:
+        seed: int or list of ints, or a Chunk whose start is the index of the first simulation.
+        numsim (int): number of simulations of every point.
+        arms (int): number of arms.
+        points (int): number of parameter points, laid out point after point like rng.grid.
+        memory: memory budget of the windows, see budget.limit.
+    """
+
+    def __init__(self, seed, numsim, arms, points = 1, memory = None):
+        self.start = 0
+        while isinstance(seed, rng.Chunk):
+            seed, self.start = seed.seed, self.start + seed.start
+        if self.start % rng.BLOCK:
+            raise ValueError('simulations must start at a multiple of %d' % rng.BLOCK)
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.numsim = numsim
+        self.arms = arms
+        self.points = points
+        self.limit = budget.limit(memory)
+        self.windows = OrderedDict()
+        self.size = 0
+
+    def _window(self, kind, window):
+        """
+        Helper function that finds the noise of DEPTH pulls of every arm in every simulation, of shape
+        (points * numsim, arms, DEPTH).
+        """
+
+        key = (kind, window)
+        if key in self.windows:
+            self.windows.move_to_end(key)
+            return self.windows[key]
+
+        # every block draws a full block of noise, so a partial block reads the same numbers as a full one
+        blocks = []
+        for point in range(self.points):
+            for first in range(0, self.numsim, rng.BLOCK):
+                sequence = np.random.SeedSequence(self.entropy, spawn_key = (point, (self.start + first) // rng.BLOCK,
+                                                                             kind, window))
+                generator = np.random.Generator(np.random.PCG64(sequence))
+                if kind == 0:
+                    noise = generator.standard_normal((rng.BLOCK, self.arms, DEPTH))
+                else:
+                    noise = generator.random((rng.BLOCK, self.arms, DEPTH))
+                blocks.append(noise[:min(rng.BLOCK, self.numsim - first)])
+        self.windows[key] = np.concatenate(blocks)
+        self.size += self.windows[key].nbytes
+
+        # drop the least recently used windows beyond the budget
+        while self.size > self.limit and len(self.windows) > 1:
+            self.size -= self.windows.popitem(last = False)[1].nbytes
+        return self.windows[key]
+
+    def _noise(self, kind, rows, arms, pulls):
+        """
+        Helper function that gathers the noise of the given pulls, where rows, arms and pulls broadcast together.
+        """
+
+        rows, arms, pulls = np.broadcast_arrays(rows, arms, np.asarray(pulls).astype(np.int64))
+        if not rows.size:
+            return np.empty(rows.shape)
+
+        # most calls only touch one window
+        windows = pulls // DEPTH
+        low, high = int(windows.min()), int(windows.max())
+        if low == high:
+            return self._window(kind, low)[rows, arms, pulls - low * DEPTH]
+        noise = np.empty(rows.shape)
+        for window in range(low, high + 1):
+            inside = windows == window
+            noise[inside] = self._window(kind, window)[rows[inside], arms[inside], pulls[inside] - window * DEPTH]
+        return noise
+
+    def normal(self, rows, arms, pulls):
+        """
+        Reads standard normal noise.
+
+        Args:
+            rows: simulations, point g * numsim + i for simulation i of point g.
+            arms: arms of the pulls.
+            pulls: index of every pull among the pulls of its arm, 0 for the first.
+
+        Returns:
+            Array with the noise of every pull, in the shape rows, arms and pulls broadcast to.
+        """
+
+        return self._noise(0, rows, arms, pulls)
+
+    def uniform(self, rows, arms, pulls):
+        """
+        Reads uniform noise between 0 and 1, like normal.
+        """
+
+        return self._noise(1, rows, arms, pulls)
+
+def table(seed, numsim, arms, points = 1, memory = None):
+    """
+    Opens the reward table of a seed, for simulation functions that read their rewards from it when their seed is an
+    rng.Common.
+
+    Args:
+        seed: seed of the simulations, e.g. an rng.Common wrapped in rng.Chunk.
+        numsim (int): number of simulations of every point.
+        arms (int): number of arms.
+        points (int): number of parameter points.
+        memory: memory budget of the table, see budget.limit.
+
+    Returns:
+        The RewardTable of the rewards seed for the same simulations, None if the seed is not an rng.Common.
+    """
+
+    start = 0
+    while isinstance(seed, rng.Chunk):
+        seed, start = seed.seed, start + seed.start
+    if not isinstance(seed, rng.Common):
+        return None
+    return RewardTable(rng.Chunk(seed.rewards, start), numsim, arms, points, memory)
+
+def common(seed):
+    """
+    Tells whether simulations with the given seed read their rewards from a common reward table.
+    """
+
+    while isinstance(seed, rng.Chunk):
+        seed = seed.seed
+    return isinstance(seed, rng.Common)
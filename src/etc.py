@@ -1,113 +1,379 @@
+import math
+import warnings
+
 import numpy as np
 
-def etc_normal(mu1, mu2, m, n, numsim):
+import budget
+import crn
+import rng
+from moments import Moments
+
+# bytes one simulation holds per round, the samples of both arms and their running sums
+_SAMPLE = 32
+
+def _normal(generator, mean, shape):
     """
-    Implementation of the explore-then-commit algorithm with two arms that both follow a normal distribution. 
-    
+    Helper function that draws unit variance normal rewards of the given shape for the given arm means.
+    """
+
+    return generator.normal(mean, 1, shape)
+
+def _bernoulli(generator, mean, shape):
+    """
+    Helper function that draws bernoulli rewards of the given shape for the given arm means.
+    """
+
+    return generator.binomial(1, mean, shape)
+
+def _exploration_rates(mu2, ms, n):
+    """
+    Helper function that replaces 'optimal' in a list of exploration rates with the optimal exploration rate.
+
     Args:
-        mu1 (int): the true mean of the first arm.
         mu2 (int): the true mean of the second arm.
-        m (int): exploration rate.
-        n (int): horizon. 
-        numsim (int) : number of simulations.
-    
+        ms: list of exploration rates.
+        n (int): horizon.
+
     Returns:
-        The average regret after simulations. 
+        Array of exploration rates.
     """
 
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
+    rates = []
+    for m in ms:
+
         # calculate optimal exploration rate
         if m == 'optimal':
             if mu2 == 0:
                 m = 1
             else:
                 m = max(1, int((4 / mu2) * np.log((n * mu2) / 4)))
-        
-        # find true reward
-        true_reward = max(mu1, mu2) * n
-        
-        # find exploration reward
-        mu1_reward = mu1 * m
-        mu2_reward = mu2 * m
-        explore_reward = mu1_reward + mu2_reward
-        
-        # find empirical mean for each arm after exploring
-        mu1_empirical = [sum([np.random.normal(mu1, 1) for i in range(m)]) / m]
-        mu2_empirical = [sum([np.random.normal(mu2, 1) for i in range(m)]) / m]
-        
-        # choose arm with greater empirical mean
-        if mu1_empirical > mu2_empirical:
-            chosen_arm = mu1
-        else:
-            chosen_arm = mu2
-        
-        # calculate total reward after exploitation phase 
-        exploit_reward = chosen_arm * (n - 2 * m)
-        total_reward = explore_reward + exploit_reward
-        
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    return expected_regret
-
-def etc_bernoulli(mu1, mu2, m, n, numsim):
-    """
-    Implementation of the explore-then-commit algorithm with two arms that both follow a bernoulli distribution. 
+        rates.append(m)
+    return np.array(rates)
+
+def _etc(mu1, mu2, ms, n, numsim, draw, seed, out, memory, trajectory = None):
+    """
+    Vectorized explore-then-commit engine. The exploration samples of each arm are drawn for all simulations of a 
+    chunk at once, round after round, and running sums over them give the commit decision of every exploration rate 
+    in a single pass. Simulations and rounds are split into chunks that fit the memory budget. The sums carry over 
+    from one chunk of rounds to the next in the order of a single cumulative sum, so every regret is the same for 
+    any budget. An array of second arm means is simulated at once, and mean g draws from the random number streams 
+    of point g, see rng.grid. With an rng.Common seed the samples are read from its common reward table instead, see 
+    crn.RewardTable.
+
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2: the true mean of the second arm, or an array of them.
+        ms: list of exploration rates.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        draw: _normal or _bernoulli.
+        seed: seed of the random number streams, see rng.streams.
+        out: array of shape (numsim, exploration rates), or (second arm means, numsim, exploration rates), that 
+            receives the regret of every simulation, or None.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, exploration rates, numsim), or (n, second arm means, exploration rates, 
+            numsim), that receives the cumulative regret of every simulation after every round, or None.
+
+    Returns:
+        List with the average regret of every exploration rate after simulations, or an array of shape (second arm 
+        means, exploration rates).
+    """
+
+    mu2s = np.atleast_1d(np.asarray(mu2, dtype = float))
+    rates = np.array([_exploration_rates(mu, ms, n) for mu in mu2s])
+
+    # find true reward
+    true_reward = np.maximum(mu1, mu2s)[:, None] * n
+
+    # find exploration reward
+    explore_reward = (mu1 + mu2s)[:, None] * rates
+
+    # only the moments of the regrets are kept, one entry per second arm mean and exploration rate
+    moments = Moments()
+    if trajectory is not None:
+        trajectory = trajectory.reshape(n, len(mu2s), rates.shape[1], numsim)
+    per_sim = (_SAMPLE * rates.max() + (2 * crn.STATE if crn.common(seed) else 0)) * len(mu2s)
+    for start, count in budget.split(numsim, per_sim, memory):
+        rngs = rng.grid(rng.Chunk(seed, start), count, len(mu2s))
+        table = crn.table(rng.Chunk(seed, start), count, 2, len(mu2s), memory)
+        rounds = max(1, budget.limit(memory) // (_SAMPLE * count * len(mu2s)))
+
+        # one row for every simulation of every second arm mean
+        means = np.repeat(np.stack(np.broadcast_arrays(mu1, mu2s), axis = 1), count, axis = 0)
+        row_rates = np.repeat(rates, count, axis = 0)
+
+        # sum the first m samples of each arm for every exploration rate, one chunk of rounds at a time
+        sums = np.empty(row_rates.shape + (2,))
+        running = 0
+        for first in range(0, rates.max(), rounds):
+            last = min(first + rounds, rates.max())
+            if table is None:
+                samples = rng.draw(rngs, lambda generator, size, mean: draw(generator, mean, (last - first, size, 2)), 
+                                   means, axis = 1)
+            elif draw is _normal:
+                samples = means + table.normal(np.arange(len(means))[:, None], np.arange(2), 
+                                               np.arange(first, last)[:, None, None])
+            else:
+                samples = (table.uniform(np.arange(len(means))[:, None], np.arange(2), 
+                                         np.arange(first, last)[:, None, None]) < means).astype(float)
+            samples[0] += running
+            samples = np.cumsum(samples, axis = 0)
+            running = samples[-1]
+            rows, columns = np.nonzero((row_rates > first) & (row_rates <= last))
+            sums[rows, columns] = samples[row_rates[rows, columns] - first - 1, rows]
+
+        # choose arm with greater empirical mean, both arms were explored m times
+        chosen_arm = np.where(sums[:, :, 0] > sums[:, :, 1], means[:, :1], means[:, 1:])
+        if trajectory is not None:
+            _etc_trajectory(trajectory[..., start:start + count], means, row_rates, chosen_arm, memory)
+
+        # calculate total reward after exploitation phase
+        exploit_reward = chosen_arm * (n - 2 * row_rates)
+        total_reward = np.repeat(explore_reward, count, axis = 0) + exploit_reward
+
+        # calculate regret of every simulation
+        regrets = (true_reward.repeat(count, axis = 0) - total_reward).reshape(len(mu2s), count, -1)
+        moments.update(regrets.transpose(0, 2, 1))
+        if out is not None:
+            out.reshape(len(mu2s), numsim, -1)[:, start:start + count] = regrets
+
+    # return average regret across simulations
+    if np.ndim(mu2) == 0:
+        return moments.mean[0].tolist()
+    return moments.mean
+
+def _etc_trajectory(trajectory, means, rates, chosen, memory):
+    """
+    Helper function that writes the cumulative regret after every round of a chunk of simulations of _etc, one chunk 
+    of rounds at a time. The exploration alternates between the arms, starting with the first, and every round 
+    earns the true mean of its arm, so the last round gives the regret of the simulation.
+    """
+
+    n, configs, _, count = trajectory.shape
+    best = means.max(axis = 1)[:, None]
+    mu1, mu2 = means[:, :1], means[:, 1:]
+    rounds = max(1, budget.limit(memory) // (_SAMPLE * rates.size))
+    for first in range(0, n, rounds):
+        t = np.arange(first, min(first + rounds, n))[:, None, None]
+
+        # regret while exploring and after committing, one entry per round, simulation and exploration rate
+        explore = best * (t + 1) - mu1 * ((t + 2) // 2) - mu2 * ((t + 1) // 2)
+        commit = (2 * best - mu1 - mu2) * rates + (best - chosen) * (t + 1 - 2 * rates)
+        regret = np.where(t < 2 * rates, explore, commit)
+        trajectory[first:first + len(t)] = regret.reshape(len(t), configs, count, -1).transpose(0, 1, 3, 2)
+
+def etc_normal_grid(mu1, mu2, ms, n, numsim, seed = None, out = None, memory = None, trajectory = None):
+    """
+    Implementation of the explore-then-commit algorithm with two arms that both follow a normal distribution,
+    evaluated for several exploration rates with one simulation.
+
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        ms: list of exploration rates, which may include 'optimal'.
+        n (int): horizon.
+        numsim (int) : number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim, len(ms)), or (len(mu2), numsim, len(ms)), that receives the regret of every 
+            simulation, None to skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, len(ms), numsim), or (n, len(mu2), len(ms), numsim), that receives the 
+            cumulative regret of every simulation after every round, see trajectory.create, None to skip it.
+
+    Returns:
+        List with the average regret of every exploration rate after simulations, or an array of shape 
+        (len(mu2), len(ms)) with them for every second arm mean.
+    """
+
+    return _etc(mu1, mu2, ms, n, numsim, _normal, seed, out, memory, trajectory)
+
+def etc_bernoulli_grid(mu1, mu2, ms, n, numsim, seed = None, out = None, memory = None, trajectory = None):
+    """
+    Implementation of the explore-then-commit algorithm with two arms that both follow a bernoulli distribution,
+    evaluated for several exploration rates with one simulation.
+
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        ms: list of exploration rates, which may include 'optimal'.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim, len(ms)), or (len(mu2), numsim, len(ms)), that receives the regret of every 
+            simulation, None to skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, len(ms), numsim), or (n, len(mu2), len(ms), numsim), that receives the 
+            cumulative regret of every simulation after every round, see trajectory.create, None to skip it.
+
+    Returns:
+        List with the average regret of every exploration rate after simulations, or an array of shape 
+        (len(mu2), len(ms)) with them for every second arm mean.
+    """
+
+    return _etc(mu1, mu2, ms, n, numsim, _bernoulli, seed, out, memory, trajectory)
+
+def etc_normal(mu1, mu2, m, n, numsim, seed = None, out = None, memory = None, trajectory = None):
+    """
+    Implementation of the explore-then-commit algorithm with two arms that both follow a normal distribution.
+
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        m (int): exploration rate.
+        n (int): horizon.
+        numsim (int) : number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim,), or (len(mu2), numsim), that receives the regret of every simulation, None to 
+            skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, numsim), or (n, len(mu2), numsim), that receives the cumulative regret of 
+            every simulation after every round, see trajectory.create, None to skip it.
+
+    Returns:
+        The average regret after simulations, or an array with it for every second arm mean.
+    """
+
+    regrets = etc_normal_grid(mu1, mu2, [m], n, numsim, seed, None if out is None else out[..., None], memory, 
+                          None if trajectory is None else trajectory[..., None, :])
+    return regrets[0] if np.ndim(mu2) == 0 else regrets[:, 0]
+
+def etc_bernoulli(mu1, mu2, m, n, numsim, seed = None, out = None, memory = None, trajectory = None):
+    """
+    Implementation of the explore-then-commit algorithm with two arms that both follow a bernoulli distribution.
+
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        m (int): exploration rate.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim,), or (len(mu2), numsim), that receives the regret of every simulation, None to 
+            skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, numsim), or (n, len(mu2), numsim), that receives the cumulative regret of 
+            every simulation after every round, see trajectory.create, None to skip it.
+
+    Returns:
+        The average regret after simulations, or an array with it for every second arm mean.
+    """
+
+    regrets = etc_bernoulli_grid(mu1, mu2, [m], n, numsim, seed, None if out is None else out[..., None], memory, 
+                             None if trajectory is None else trajectory[..., None, :])
+    return regrets[0] if np.ndim(mu2) == 0 else regrets[:, 0]
+
+def _binomial_pmf(m, p):
+    """
+    Helper function that computes the probability of every number of successes in m bernoulli trials with mean p.
+    
+    Args:
+        m (int): number of trials.
+        p (float): probability of success.
+    
+    Returns:
+        Array with the probability of 0 to m successes.
+    """
+    
+    k = np.arange(m + 1)
+    if p == 0 or p == 1:
+        return (k == m * p).astype(float)
+    
+    # log of m choose k built up as a running sum
+    log_choose = np.concatenate([[0], np.cumsum(np.log(np.arange(m, 0, -1) / np.arange(1, m + 1)))])
+    return np.exp(log_choose + k * np.log(p) + (m - k) * np.log(1 - p))
+
+def _etc_exact(mu1, mu2, m, n, p1):
+    """
+    Helper function that computes the exact regret of explore-then-commit from the probability of committing to the 
+    first arm. The regret only takes two values, one for each arm it can commit to.
     
     Args:
         mu1 (int): the true mean of the first arm.
         mu2 (int): the true mean of the second arm.
         m (int): exploration rate.
         n (int): horizon.
-        numsim (int): number of simulations.
+        p1 (float): probability of committing to the first arm.
     
     Returns:
-        The average regret after simulations. 
+        The expected regret and regret variance.
     """
+    
+    # regret after committing to either arm
+    true_reward = max(mu1, mu2) * n
+    explore_reward = (mu1 + mu2) * m
+    mu1_regret = true_reward - explore_reward - mu1 * (n - 2 * m)
+    mu2_regret = true_reward - explore_reward - mu2 * (n - 2 * m)
+    
+    expected_regret = p1 * mu1_regret + (1 - p1) * mu2_regret
+    variance = p1 * (1 - p1) * (mu1_regret - mu2_regret)**2
+    return [expected_regret, variance]
 
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # calculate optimal exploration rate
-        if m == 'optimal':
-            if mu2 == 0:
-                m = 1
-            else:
-                m = max(1, int((4 / mu2) * np.log((n * mu2) / 4)))
-                
-        # find true reward
-        true_reward = max(mu1, mu2) * n
-        
-        # find exploration reward
-        mu1_reward = mu1 * m
-        mu2_reward = mu2 * m
-        explore_reward = mu1_reward + mu2_reward
-        
-        # find empirical mean for each arm after exploring
-        mu1_empirical = [sum([np.random.binomial(n = 1, p = mu1) for i in range(m)]) / m]
-        mu2_empirical = [sum([np.random.binomial(n = 1, p = mu2) for i in range(m)]) / m]
-
-        # choose arm with greater empirical mean
-        if mu1_empirical > mu2_empirical:
-            chosen_arm = mu1
-        else:
-            chosen_arm = mu2
-    
-        # calculate total reward after exploitation phase 
-        exploit_reward = chosen_arm * (n - 2*m)
-        total_reward = exploit_reward + explore_reward
-
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    return expected_regret
\ No newline at end of file
+def _validate(expected_regret, variance, estimate, numsim):
+    """
+    Helper function that warns when a Monte Carlo estimate is more than four standard errors away from the exact 
+    expected regret.
+    """
+    
+    if abs(estimate - expected_regret) > 4 * math.sqrt(variance / numsim) + 1e-9:
+        warnings.warn('Monte Carlo regret %f differs from the exact regret %f' % (estimate, expected_regret))
+
+def etc_normal_exact(mu1, mu2, m, n, validate = 0, seed = None):
+    """
+    Exact regret of the explore-then-commit algorithm with two arms that both follow a normal distribution. After 
+    m pulls of each arm, the difference of the empirical means is normal with mean mu1 - mu2 and variance 2 / m.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm.
+        m (int): exploration rate.
+        n (int): horizon.
+        validate (int): number of simulations used to check the result against etc_normal, 0 to skip the check.
+        seed: seed of the random number streams of the check, None to use fresh entropy.
+    
+    Returns:
+        The expected regret and regret variance.
+    """
+    
+    m = int(_exploration_rates(mu2, [m], n)[0])
+    
+    # probability that the first arm has the greater empirical mean
+    p1 = 0.5 * (1 + math.erf((mu1 - mu2) * math.sqrt(m) / 2))
+    result = _etc_exact(mu1, mu2, m, n, p1)
+    
+    if validate:
+        _validate(result[0], result[1], etc_normal(mu1, mu2, m, n, validate, seed), validate)
+    return result
+
+def etc_bernoulli_exact(mu1, mu2, m, n, validate = 0, seed = None):
+    """
+    Exact regret of the explore-then-commit algorithm with two arms that both follow a bernoulli distribution. After 
+    m pulls of each arm, the number of successes of each arm is binomial.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm.
+        m (int): exploration rate.
+        n (int): horizon.
+        validate (int): number of simulations used to check the result against etc_bernoulli, 0 to skip the check.
+        seed: seed of the random number streams of the check, None to use fresh entropy.
+    
+    Returns:
+        The expected regret and regret variance.
+    """
+    
+    m = int(_exploration_rates(mu2, [m], n)[0])
+    
+    # probability that the first arm has strictly more successes than the second arm
+    mu1_pmf = _binomial_pmf(m, mu1)
+    mu2_pmf = _binomial_pmf(m, mu2)
+    mu1_greater = 1 - np.cumsum(mu1_pmf)
+    p1 = min(1.0, max(0.0, float(mu2_pmf @ mu1_greater)))
+    result = _etc_exact(mu1, mu2, m, n, p1)
+    
+    if validate:
+        _validate(result[0], result[1], etc_bernoulli(mu1, mu2, m, n, validate, seed), validate)
+    return result
@@ -0,0 +1,275 @@
+import os
+import time
+import pickle
+import socket
+import sqlite3
+import argparse
+import threading
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import rng
+from sweep import estimate, task_key
+
+# claims of a shard after which it is marked failed instead of queued again, counting workers that died with it
+MAX_ATTEMPTS = 3
+
+# shards are claimed most expensive first, a shard is a range of simulations of one task
+_schema = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    task TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    job BLOB NOT NULL,
+    cost REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    expires REAL,
+    regrets BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (task, start)
+)
+"""
+
+# columns added after the first version of the schema, added to queues created before them
+_added = {'attempts': 'INTEGER NOT NULL DEFAULT 0', 'error': 'TEXT'}
+
+def _connect(database):
+    """
+    Helper function that opens the queue database in autocommit mode, so every transaction is explicit.
+    """
+
+    connection = sqlite3.connect(database, timeout = 60, isolation_level = None)
+    connection.execute(_schema)
+    columns = {row[1] for row in connection.execute('PRAGMA table_info(shards)')}
+    for name, kind in _added.items():
+        if name not in columns:
+            connection.execute('ALTER TABLE shards ADD COLUMN %s %s' % (name, kind))
+    return connection
+
+def _regrets(func, args):
+    """
+    Helper function that allocates the out array of a shard, one regret for every simulation, or one for every
+    simulation and exploration rate for functions with a list of rates like etc_normal_grid.
+    """
+
+    arguments = inspect.signature(func).bind(*args).arguments
+    shape = (arguments['numsim'],)
+    if 'ms' in arguments:
+        shape += (len(arguments['ms']),)
+    return np.empty(shape)
+
+def submit(database, tasks, shard = 4 * rng.BLOCK):
+    """
+    Adds the shards of a list of tasks to the queue. Every task is split into ranges of shard simulations, each
+    running with the random number streams it would use in a single run of the task. Shards that are already in the
+    queue, queued or done, are left as they are, so submitting the same tasks again resumes them. Failed shards are
+    queued again with a fresh count of attempts.
+
+    Args:
+        database: path of the SQLite file, on storage that every worker can reach.
+        tasks: list of (function, arguments, seed) tuples of a single configuration each, the function needs 
+            numsim, seed and out arguments.
+        shard (int): number of simulations per shard, a multiple of rng.BLOCK.
+
+    Returns:
+        List with the key of every task.
+    """
+
+    if shard % rng.BLOCK:
+        raise ValueError('shards must hold a multiple of %d simulations' % rng.BLOCK)
+
+    keys = []
+    connection = _connect(database)
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        for func, args, seed in tasks:
+            key = task_key(func, args, seed)
+            keys.append(key)
+            signature = inspect.signature(func)
+            numsim = signature.bind(*args).arguments['numsim']
+            for start in range(0, numsim, shard):
+                bound = signature.bind(*args)
+                bound.arguments['numsim'] = min(shard, numsim - start)
+                job = pickle.dumps((func, bound.args, rng.Chunk(seed, start)))
+                connection.execute('INSERT OR IGNORE INTO shards (task, start, count, job, cost) VALUES (?, ?, ?, ?, ?)',
+                                   (key, start, bound.arguments['numsim'], job, estimate(func, bound.args)))
+            connection.execute("UPDATE shards SET state = 'queued', attempts = 0, error = NULL WHERE task = ? AND "
+                               "state = 'failed'", (key,))
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+    return keys
+
+def _claim(connection, worker, lease):
+    """
+    Helper function that atomically claims the most expensive shard that is queued or whose lease has expired. A
+    shard whose lease expired after MAX_ATTEMPTS claims is marked failed, its workers keep dying with it.
+    """
+
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute("UPDATE shards SET state = 'failed', error = 'the lease expired, the worker died' WHERE "
+                           "state = 'running' AND expires < ? AND attempts >= ?", (time.time(), MAX_ATTEMPTS))
+        row = connection.execute("SELECT id, job FROM shards WHERE state = 'queued' OR (state = 'running' AND "
+                                 "expires < ?) ORDER BY cost DESC LIMIT 1", (time.time(),)).fetchone()
+        if row is not None:
+            connection.execute("UPDATE shards SET state = 'running', worker = ?, expires = ?, attempts = attempts + 1 "
+                               "WHERE id = ?", (worker, time.time() + lease, row[0]))
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return row
+
+def _renew(database, shard, worker, lease, stop):
+    """
+    Helper function run on a thread that extends the lease of a running shard until stop is set, so only shards of
+    workers that died ever expire.
+    """
+
+    connection = _connect(database)
+    try:
+        while not stop.wait(lease / 3):
+            connection.execute("UPDATE shards SET expires = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                               (time.time() + lease, shard, worker))
+    finally:
+        connection.close()
+
+def _pending(connection, keys):
+    """
+    Helper function that counts the shards that are neither done nor failed, of the given tasks or of every task.
+    """
+
+    if keys is None:
+        return connection.execute("SELECT COUNT(*) FROM shards WHERE state NOT IN ('done', 'failed')").fetchone()[0]
+    marks = ', '.join('?' * len(keys))
+    return connection.execute("SELECT COUNT(*) FROM shards WHERE state NOT IN ('done', 'failed') AND task IN (%s)"
+                              % marks, list(keys)).fetchone()[0]
+
+def work(database, keys = None, lease = 600, poll = 5):
+    """
+    Claims and runs shards until every shard of the given tasks is done or failed. A worker that finds nothing to
+    claim while other shards are still running waits for them, so it can take over a shard whose worker died once its
+    lease expires. A shard whose function raises is queued again with the error recorded, and marked failed after
+    MAX_ATTEMPTS claims.
+
+    Args:
+        database: path of the SQLite file.
+        keys: list of task keys to wait for, None to wait for every task in the queue.
+        lease (float): seconds a claimed shard stays reserved without its worker renewing the lease.
+        poll (float): seconds between checks of the queue when nothing can be claimed.
+
+    Returns:
+        The number of shards this worker ran.
+    """
+
+    worker = '%s:%d' % (socket.gethostname(), os.getpid())
+    connection = _connect(database)
+    done = 0
+    try:
+        while True:
+            row = _claim(connection, worker, lease)
+            if row is None:
+                if not _pending(connection, keys):
+                    return done
+                time.sleep(poll)
+                continue
+
+            shard, job = row
+            func, args, seed = pickle.loads(job)
+            stop = threading.Event()
+            renew = threading.Thread(target = _renew, args = (database, shard, worker, lease, stop), daemon = True)
+            renew.start()
+            try:
+                regrets = _regrets(func, args)
+                func(*args, seed = seed, out = regrets)
+            except Exception as error:
+                connection.execute("UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                                   "error = ?, worker = NULL, expires = NULL WHERE id = ? AND worker = ?",
+                                   (MAX_ATTEMPTS, '%s: %s' % (type(error).__name__, error), shard, worker))
+                continue
+            finally:
+                stop.set()
+                renew.join()
+
+            # a worker that lost its lease leaves the result to the worker that took the shard over
+            connection.execute("UPDATE shards SET state = 'done', regrets = ?, expires = NULL WHERE id = ? AND "
+                               "worker = ?", (regrets.tobytes(), shard, worker))
+            done += 1
+    finally:
+        connection.close()
+
+def collect(database, keys):
+    """
+    Reads back the regret of every simulation of the given tasks, raising a RuntimeError with the recorded error if a
+    shard of them failed.
+
+    Args:
+        database: path of the SQLite file.
+        keys: list of task keys returned by submit.
+
+    Returns:
+        List with an array of the regrets of every task, of shape (numsim,), or (numsim, len(ms)) for functions with 
+        a list of exploration rates.
+    """
+
+    connection = _connect(database)
+    try:
+        regrets = []
+        for key in keys:
+            failed = connection.execute("SELECT start, attempts, error FROM shards WHERE task = ? AND state = 'failed' "
+                                        "ORDER BY start LIMIT 1", (key,)).fetchone()
+            if failed is not None:
+                raise RuntimeError('task %s failed at simulation %d after %d attempts: %s' % ((key,) + failed))
+            rows = connection.execute('SELECT state, regrets, job FROM shards WHERE task = ? ORDER BY start',
+                                      (key,)).fetchall()
+            if not rows or any(state != 'done' for state, _, _ in rows):
+                raise RuntimeError('task %s has shards that are not done' % key)
+            func, args, _ = pickle.loads(rows[0][2])
+            shape = _regrets(func, args).shape[1:]
+            regrets.append(np.concatenate([np.frombuffer(blob).reshape((-1,) + shape) for _, blob, _ in rows]))
+        return regrets
+    finally:
+        connection.close()
+
+def run(database, tasks, workers = 1, lease = 600):
+    """
+    Submits a list of tasks, works on the queue with a pool of processes until they are done and collects their
+    regrets. Workers on other hosts pointed at the same database, see main, share the work.
+
+    Args:
+        database: path of the SQLite file.
+        tasks: list of (function, arguments, seed) tuples.
+        workers (int): number of processes working on the queue.
+        lease (float): seconds a claimed shard stays reserved without its worker renewing the lease.
+
+    Returns:
+        List with an array of the regrets of every task, see collect.
+    """
+
+    keys = submit(database, tasks)
+    if workers == 1:
+        work(database, keys, lease)
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            list(pool.map(work, [database] * workers, [keys] * workers, [lease] * workers))
+    return collect(database, keys)
+
+def main(database, workers, lease):
+    # standalone workers that run shards until the queue is empty
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        done = sum(pool.map(work, [database] * workers, [None] * workers, [lease] * workers))
+    print('{}: ran {} shards'.format(database, done))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--lease", type=float, default=600, help="seconds before the shard of a dead worker is requeued")
+    args = parser.parse_args()
+    main(args.database, args.workers, args.lease)
@@ -0,0 +1,176 @@
+import numpy as np
+import os
+
+def kl_bernoulli(p, q):
+    """
+    Computes the kl-divergence between bernoulli distributions with means p and q.
+    
+    Args:
+        p: array of means of the first distributions.
+        q: array of means of the second distributions.
+    
+    Returns:
+        Array with the kl-divergence of every pair.
+    """
+    
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return np.where(p > 0, p * np.log(p / q), 0) + np.where(p < 1, (1 - p) * np.log((1 - p) / (1 - q)), 0)
+
+def klucb_index(p, bound, q0 = None, tol = 1e-6, max_iter = 50):
+    """
+    Solves max{q in [p, 1] : kl(p, q) <= bound} for a whole array of (p, bound) pairs at once with a two-sided 
+    Newton method. kl(p, q) is increasing and convex in q on [p, 1), so a Newton step from either end of a 
+    bracket [lo, hi] around the root never falls below the root, and the chord between the ends never lands above 
+    it. Every iteration tries both points, which shrinks the bracket from both sides, and falls back to a bisection 
+    step whenever either point does not move inside the bracket.
+    
+    Args:
+        p: array of empirical means.
+        bound: array of exploration bounds, broadcastable to p.
+        q0: optional array of starting points, for example the indices of the previous round.
+        tol (float): every entry stops once its bracket is no wider than tol, so the index it returns is below the 
+            exact index by at most tol and does not depend on the other entries solved with it.
+        max_iter (int): maximum number of iterations.
+    
+    Returns:
+        Array with the KL-UCB index of every pair, the lower end of its final bracket, so kl(p, q) <= bound holds 
+        for every index.
+    """
+    
+    p = np.asarray(p, dtype = float)
+    bound = np.broadcast_to(bound, p.shape)
+    f = lambda q: kl_bernoulli(p, q) - bound
+    
+    # the root lies in [p, 1], or at p itself when the bound is not positive
+    lo = p.copy()
+    hi = np.where(bound > 0, 1.0, p)
+    f_lo = -bound.astype(float)
+    f_hi = f(hi)
+    
+    def narrow(q, lo, hi, f_lo, f_hi, active):
+        # move the end of the bracket on the side of the root that q lies on
+        f_q = f(q)
+        below = active & (f_q <= 0)
+        above = active & (f_q > 0)
+        return (np.where(below, q, lo), np.where(above, q, hi), 
+                np.where(below, f_q, f_lo), np.where(above, f_q, f_hi))
+    
+    if q0 is not None:
+        q = np.clip(q0, lo, hi)
+        lo, hi, f_lo, f_hi = narrow(q, lo, hi, f_lo, f_hi, hi - lo > tol)
+    
+    for _ in range(max_iter):
+        active = hi - lo > tol
+        if not active.any():
+            break
+        middle = (lo + hi) / 2
+        
+        # newton steps with derivative (q - p) / (q * (1 - q)) from both ends, of which the lower is nearer the 
+        # root, and the chord between both ends
+        with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+            newton = np.fmin(hi - f_hi * hi * (1 - hi) / (hi - p), lo - f_lo * lo * (1 - lo) / (lo - p))
+            chord = lo - f_lo * (hi - lo) / (f_hi - f_lo)
+        # once the step is too small to close the bracket, probe just below the upper end instead
+        newton = np.where(hi - newton < tol / 2, hi - tol / 2, newton)
+        newton = np.where((newton > lo) & (newton < hi), newton, middle)
+        chord = np.where((chord > lo) & (chord < hi), chord, middle)
+        
+        lo, hi, f_lo, f_hi = narrow(newton, lo, hi, f_lo, f_hi, active)
+        chord = np.clip(chord, lo, hi)
+        lo, hi, f_lo, f_hi = narrow(chord, lo, hi, f_lo, f_hi, active & (chord > lo) & (chord < hi))
+    return lo
+
+# tables built in this process, keyed by their size, largest bound, error bound and path
+_tables = {}
+
+def kl_table(size = 513, max_bound = 4.0, max_error = 1e-2, path = None):
+    """
+    Builds or loads a lookup table of the KL-UCB index over a grid of empirical means and exploration bounds. The 
+    grid is uniform in p and in the square root of the bound. Tables are memoized per process, and if a path is 
+    given the table is loaded from it when it exists and was built with the same size, largest bound and error 
+    bound, and built and saved to it otherwise.
+    
+    The index is increasing in both p and the bound, so every value inside a grid cell lies between the values at 
+    its lower-left and upper-right corners. The difference between those corners is a guaranteed bound on the 
+    interpolation error, and cells where it exceeds max_error are marked to be solved exactly instead.
+    
+    Args:
+        size (int): number of grid points along each axis.
+        max_bound (float): largest exploration bound covered by the table.
+        max_error (float): largest interpolation error allowed in a cell.
+        path (str): optional .npz file to load the table from or save it to.
+    
+    Returns:
+        Dictionary with the grid step sizes, the index at every grid point and the cells that must be solved exactly.
+    """
+    
+    key = (size, max_bound, max_error, path)
+    if key in _tables:
+        return _tables[key]
+    
+    table = None
+    if path is not None and os.path.exists(path):
+        with np.load(path) as file:
+            table = dict(file)
+        
+        # a file built with other parameters is rebuilt
+        if 'params' not in table or not np.array_equal(table['params'], [size, max_bound, max_error]):
+            table = None
+    if table is None:
+        p = np.linspace(0, 1, size)
+        root_bound = np.linspace(0, np.sqrt(max_bound), size)
+        p, root_bound = np.meshgrid(p, root_bound, indexing = 'ij')
+        q = klucb_index(p, root_bound**2, tol = 1e-12)
+        table = {
+            'p_step': np.array(1 / (size - 1)),
+            'root_bound_step': np.array(np.sqrt(max_bound) / (size - 1)),
+            'q': q,
+            'exact': (q[1:, 1:] - q[:-1, :-1]) > max_error,
+            'params': np.array([size, max_bound, max_error], dtype = float),
+        }
+        if path is not None:
+            np.savez(path, **table)
+    
+    _tables[key] = table
+    return table
+
+def klucb_index_table(p, bound, table, q0 = None, tol = 1e-6):
+    """
+    Finds the KL-UCB index for an array of (p, bound) pairs by bilinear interpolation in a table from kl_table. Pairs 
+    that fall in a cell whose error bound is too large, or beyond the largest bound of the table, are solved exactly 
+    with klucb_index.
+    
+    Args:
+        p: array of empirical means.
+        bound: array of exploration bounds, broadcastable to p.
+        table: lookup table returned by kl_table.
+        q0: optional array of starting points for the pairs that are solved exactly.
+        tol (float): tolerance used for the pairs that are solved exactly.
+    
+    Returns:
+        Array with the KL-UCB index of every pair.
+    """
+    
+    p = np.asarray(p, dtype = float)
+    bound = np.broadcast_to(bound, p.shape)
+    q_grid = table['q']
+    last = q_grid.shape[0] - 2
+    
+    # locate the cell of every pair and its position inside the cell
+    x = p / table['p_step']
+    y = np.sqrt(np.maximum(bound, 0)) / table['root_bound_step']
+    i = np.minimum(x.astype(int), last)
+    j = np.minimum(y.astype(int), last)
+    dx = x - i
+    dy = y - j
+    
+    # bilinear interpolation between the four corners of the cell
+    q = ((1 - dx) * ((1 - dy) * q_grid[i, j] + dy * q_grid[i, j + 1]) 
+         + dx * ((1 - dy) * q_grid[i + 1, j] + dy * q_grid[i + 1, j + 1]))
+    
+    # fall back to the exact solver where the table cannot guarantee the error
+    exact = (y > last + 1) | table['exact'][i, j]
+    if exact.any():
+        start = None if q0 is None else np.broadcast_to(q0, p.shape)[exact]
+        q[exact] = klucb_index(p[exact], bound[exact], start, tol)
+    return q
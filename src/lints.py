@@ -1,6 +1,9 @@
 import numpy as np
 
-def lin_ts(v, a, n, numsim):
+import rng
+from moments import Moments
+
+def lin_ts(v, a, n, numsim, seed = None, out = None, trajectory = None):
     """
     Implementation of Thompson Sampling applied to linear bandits.
     
@@ -9,14 +12,18 @@ def lin_ts(v, a, n, numsim):
         a: list of feature vectors for both arms.
         n(int): horizon
         numsim(int): number of simulations
+        seed: seed of the random number streams, None to use fresh entropy.
+        out: array of shape (numsim,) that receives the regret of every simulation, None to skip it.
+        trajectory: array of shape (n, numsim) that receives the cumulative regret of every simulation after every 
+            round, see trajectory.create, None to skip it.
         
     Returns:
         The average regret and regret variance after simulations. 
     """
     
-    # list used to store regrets across simulations
-    regrets = []
-    for _ in range(numsim):
+    # running moments of the regrets across simulations
+    moments = Moments()
+    for sim, generator in enumerate(rng.replicates(seed, numsim)):
         
         # set theta, sigma to prior
         theta, sigma = 0, 1
@@ -30,6 +37,7 @@ def lin_ts(v, a, n, numsim):
         # initialize vectors
         total_reward = 0.0
         selections = [0,0]
+        path = np.empty(n)
 
         #pull first arm before starting algorithm
         a1_reward = a[0] * v
@@ -43,10 +51,13 @@ def lin_ts(v, a, n, numsim):
         theta = 1/(1/sigma + a[1] * a[1]) * (((1/sigma) * theta) + a2_reward*a[1])
         sigma = 1/(1/sigma + a[1] * a[1])
 
+        # the initial pulls do not count towards the total reward
+        path[:2] = maxarm * np.arange(1, 3)
+
         for i in range(2, n):
             
             # sample from distribution
-            x = np.random.normal(theta, sigma)
+            x = generator.normal(theta, sigma)
             
             # choose greater arm
             arms = [np.inner(x, a[0]), np.inner(x, a[1])]
@@ -56,12 +67,15 @@ def lin_ts(v, a, n, numsim):
             selections[pulled] += 1
             theta = 1/(1/sigma + a[pulled] * a[pulled]) * (((1/sigma) * theta) + reward*a[pulled])
             sigma = 1/(1/sigma + a[pulled] * a[pulled])
+            path[i] = maxarm * (i + 1) - total_reward
         
         # calculate regret
         regret = true_reward - total_reward
-        regrets.append(regret)
+        moments.add(regret)
+        if out is not None:
+            out[sim] = regret
+        if trajectory is not None:
+            trajectory[:, sim] = path
         
     # find and return average regret and variance across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
\ No newline at end of file
+    return moments.summary()
\ No newline at end of file
@@ -1,6 +1,9 @@
 import numpy as np
 
-def lin_ucb(v, a, n, numsim):
+import rng
+from moments import Moments
+
+def lin_ucb(v, a, n, numsim, seed = None, out = None, trajectory = None):
     """
     Implementation of the UCB algorithm applied to linear bandits.
     
@@ -9,14 +12,18 @@ def lin_ucb(v, a, n, numsim):
         a: list of feature vectors for both arms.
         n(int): horizon
         numsim(int): number of simulations
+        seed: seed of the random number streams, None to use fresh entropy.
+        out: array of shape (numsim,) that receives the regret of every simulation, None to skip it.
+        trajectory: array of shape (n, numsim) that receives the cumulative regret of every simulation after every 
+            round, see trajectory.create, None to skip it.
         
     Returns:
         The average regret and regret variance after simulations. 
     """
     
-    # list used to store regrets across simulations
-    regrets = []
-    for _ in range(numsim):
+    # running moments of the regrets across simulations
+    moments = Moments()
+    for sim, generator in enumerate(rng.replicates(seed, numsim)):
         
         # set delta and lambda values
         delta = 1/n
@@ -28,6 +35,7 @@ def lin_ucb(v, a, n, numsim):
         theta = 0
         V = lmbda
         total_reward = 0
+        path = np.empty(n)
         
         # find true reward
         arm1_exp_reward = a[0] * v
@@ -43,23 +51,26 @@ def lin_ucb(v, a, n, numsim):
             for i in range(len(arms)):
                 arms[i] = a[i] * theta + beta * np.sqrt(a[i] * a[i] * (1/V))
             if arms[0] == arms[1]:
-                pulled = np.random.choice(len(arms)) # arbritarily choose arms if equal
+                pulled = generator.choice(len(arms)) # arbritarily choose arms if equal
             else:
                 pulled = np.argmax(arms)
 
-            output = a[pulled] * v + np.random.normal(0, 1) # equation to find reward
+            output = a[pulled] * v + generator.normal(0, 1) # equation to find reward
             total_reward += output
 
             # updates 
             V = V + a[pulled] * a[pulled]
             b = b + output * a[pulled]
             theta = (1/V) * b
+            path[t - 1] = maxarm * t - total_reward
             
         # calculate regret
         regret = true_reward - total_reward
-        regrets.append(regret)
+        moments.add(regret)
+        if out is not None:
+            out[sim] = regret
+        if trajectory is not None:
+            trajectory[:, sim] = path
     
     # find and return average regret and variance across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
\ No newline at end of file
+    return moments.summary()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import numpy as np
+
+class Moments:
+    """
+    Running count, average and sum of squared deviations (M2) of regrets, which take constant memory for any number
+    of simulations. Single regrets are added with the update of Welford, and batches of regrets and the moments of
+    other chunks, threads or hosts are merged with the pairwise update of Chan et al., so the moments of any split of
+    the simulations merge into those of all of them. The average and M2 may be arrays, one entry per configuration.
+
+    Args:
+        count (int): number of regrets.
+        mean: average regret.
+        m2: sum of squared deviations of the regrets from their average.
+    """
+
+    def __init__(self, count = 0, mean = 0.0, m2 = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_summary(cls, summary, count):
+        """
+        Builds the moments of count regrets from their average regret and regret variance.
+
+        Args:
+            summary: the average regret and regret variance, e.g. returned by a simulation function.
+            count (int): number of regrets.
+
+        Returns:
+            The moments.
+        """
+
+        mean, var = summary
+        return cls(count, mean, var * count)
+
+    def add(self, regret):
+        """
+        Adds the regret of one simulation, or one regret for every configuration.
+
+        Args:
+            regret: regret of the simulation.
+
+        Returns:
+            The moments themselves.
+        """
+
+        self.count += 1
+        delta = regret - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (regret - self.mean)
+        return self
+
+    def update(self, regrets):
+        """
+        Adds the regrets of a batch of simulations.
+
+        Args:
+            regrets: array with the simulations along its last axis, and the configurations along the others.
+
+        Returns:
+            The moments themselves.
+        """
+
+        regrets = np.asarray(regrets, dtype = float)
+        if regrets.shape[-1] == 0:
+            return self
+        mean = regrets.mean(axis = -1)
+        return self.merge(Moments(regrets.shape[-1], mean, ((regrets - mean[..., None])**2).sum(axis = -1)))
+
+    def merge(self, other):
+        """
+        Merges the moments of other simulations into these.
+
+        Args:
+            other: moments of the other simulations.
+
+        Returns:
+            The moments themselves.
+        """
+
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / total
+        self.m2 = self.m2 + other.m2 + delta**2 * self.count * other.count / total
+        self.count = total
+        return self
+
+    @property
+    def var(self):
+        """
+        Regret variance, normalized by the number of regrets like np.var.
+        """
+
+        return self.m2 / self.count
+
+    def summary(self):
+        """
+        Finds the average regret and regret variance.
+
+        Returns:
+            List of the average regret and regret variance, or an array with both along its last axis for every
+            configuration.
+        """
+
+        if np.ndim(self.mean) == 0:
+            return [self.mean, self.var]
+        return np.stack([self.mean, self.var], axis = -1)
@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+import numpy as np
+
+# seed of a chunk of simulations that starts at simulation start of the full run, passed as the seed of a function
+Chunk = namedtuple('Chunk', ['seed', 'start'])
+
+# seed whose rewards are read from the common reward table of the rewards seed, see crn.RewardTable, while the 
+# other random numbers of the algorithm come from the streams of seed
+Common = namedtuple('Common', ['seed', 'rewards'])
+
+# number of consecutive simulations that share one random number stream
+BLOCK = 256
+
+def streams(seed, numsim, start = 0, point = 0):
+    """
+    Splits simulations into blocks of BLOCK simulations and gives every block its own random number generator,
+    derived from the seed and the (point, block) pair with np.random.SeedSequence. A block's stream never depends on
+    how many simulations run or in which chunk or worker they run, so any simulation can be reproduced by running
+    only its own block.
+
+    Args:
+        seed: int or list of ints, None for fresh entropy, a Chunk whose start is added to start, or a Common.
+        numsim (int): number of simulations.
+        start (int): index of the first simulation, a multiple of BLOCK.
+        point (int): index of the parameter point the simulations belong to.
+
+    Returns:
+        List of (first, last, generator) tuples, where simulations first to last - 1 counted from start share the
+        generator.
+    """
+
+    while isinstance(seed, (Chunk, Common)):
+        if isinstance(seed, Chunk):
+            start += seed.start
+        seed = seed.seed
+    if start % BLOCK:
+        raise ValueError('simulations must start at a multiple of %d' % BLOCK)
+
+    entropy = np.random.SeedSequence(seed).entropy
+    result = []
+    for first in range(0, numsim, BLOCK):
+        sequence = np.random.SeedSequence(entropy, spawn_key = (point, (start + first) // BLOCK))
+        result.append((first, min(first + BLOCK, numsim), np.random.Generator(np.random.PCG64(sequence))))
+    return result
+
+def draw(rngs, sampler, *params, axis = 0):
+    """
+    Draws random numbers for every simulation, each block from its own stream.
+
+    Args:
+        rngs: list returned by streams.
+        sampler: function of (generator, number of simulations, parameters of those simulations) that returns an
+            array with the simulations along the given axis.
+        params: arrays with one entry per simulation along their first axis.
+        axis (int): axis of the sampled arrays that runs over the simulations.
+
+    Returns:
+        Array with the samples of all simulations.
+    """
+
+    blocks = [sampler(rng, last - first, *[param[first:last] for param in params]) for first, last, rng in rngs]
+    if len(blocks) == 1:
+        return blocks[0]
+    return np.concatenate(blocks, axis = axis)
+
+def replicates(seed, numsim):
+    """
+    Yields the generator of every simulation in turn, for algorithms that run one simulation at a time. Simulations
+    of the same block continue the same stream, so they match the vectorized algorithms block for block.
+
+    Args:
+        seed: int or list of ints, None for fresh entropy, or a Chunk.
+        numsim (int): number of simulations.
+
+    Yields:
+        The generator of each simulation.
+    """
+
+    for first, last, generator in streams(seed, numsim):
+        for _ in range(first, last):
+            yield generator
+
+def grid(seed, numsim, points):
+    """
+    Streams for numsim simulations at each of several parameter points that are stepped together, laid out point
+    after point so simulation i of point g is row g * numsim + i. Point g uses the streams of streams(seed, numsim,
+    point = g), so every point draws the same numbers however many points run with it.
+
+    Args:
+        seed: int or list of ints, None for fresh entropy, or a Chunk.
+        numsim (int): number of simulations of every point.
+        points (int): number of parameter points.
+
+    Returns:
+        List of (first, last, generator) tuples over the rows of all points, like streams.
+    """
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    result = []
+    for point in range(points):
+        for first, last, generator in streams(seed, numsim, point = point):
+            result.append((point * numsim + first, point * numsim + last, generator))
+    return result
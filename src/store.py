@@ -0,0 +1,148 @@
+import os
+import glob
+import hashlib
+import inspect
+from numbers import Real
+
+import numpy as np
+
+import atomic
+
+# directory of the store when BANDIT_STORE is not set, next to the figures in Results/
+DEFAULT = os.path.join('Results', 'store')
+
+def directory():
+    """
+    Finds the directory of the results store, from the BANDIT_STORE environment variable or DEFAULT.
+    """
+
+    return os.environ.get('BANDIT_STORE', DEFAULT)
+
+def render_only():
+    """
+    Tells whether sweeps read every result back from the store instead of running any simulation, which the
+    BANDIT_RENDER_ONLY environment variable turns on.
+    """
+
+    return os.environ.get('BANDIT_RENDER_ONLY', '') not in ('', '0')
+
+def _columns(func, params):
+    """
+    Helper function that builds the parameter index of a shard, one column per argument of the function, holding
+    numbers as floats and anything else, e.g. a list of exploration rates, as its text.
+    """
+
+    arguments = [inspect.signature(func).bind(*args).arguments for args in params]
+    columns = {}
+    for name in arguments[0]:
+        values = [bound.get(name) for bound in arguments]
+        if all(isinstance(value, Real) for value in values):
+            columns[name] = np.array(values, dtype = float)
+        else:
+            columns[name] = np.array([str(value) for value in values])
+    return columns
+
+def append(funcs, params, keys, results):
+    """
+    Writes the results of a sweep to the store, one shard per algorithm with a column for the key, the result and
+    every argument of its tasks. A shard is named after the algorithm and the keys of its tasks, so running the same
+    sweep again replaces its shard instead of adding another.
+
+    Args:
+        funcs: list with the simulation function of every task.
+        params: list with the arguments of every task.
+        keys: list with the key of every task, see sweep.task_key.
+        results: list with the result of every task, e.g. its average regret and regret variance.
+    """
+
+    path = directory()
+    os.makedirs(path, exist_ok = True)
+    for func in {func.__name__: func for func in funcs}.values():
+        rows = [i for i, other in enumerate(funcs) if other is func]
+        name = hashlib.sha1(' '.join(keys[i] for i in rows).encode()).hexdigest()[:16]
+        shard = os.path.join(path, '%s-%s.npz' % (func.__name__, name))
+
+        columns = _columns(func, [params[i] for i in rows])
+        columns['key'] = np.array([keys[i] for i in rows])
+        columns['result'] = np.array([results[i] for i in rows], dtype = float)
+
+        # a kill while writing leaves no broken shard
+        atomic.write(shard, lambda file: np.savez_compressed(file, **columns))
+
+def _shards(names):
+    """
+    Helper function that lists the shards of the given algorithms, oldest first, so results of later shards replace
+    those of earlier ones.
+    """
+
+    paths = []
+    for name in set(names):
+        paths.extend(glob.glob(os.path.join(directory(), glob.escape(name) + '-*.npz')))
+    return sorted(paths, key = os.path.getmtime)
+
+def lookup(funcs, keys):
+    """
+    Reads back the results of a sweep from the store, reading only the key and result columns of the shards of its
+    algorithms.
+
+    Args:
+        funcs: list with the simulation function of every task.
+        keys: list with the key of every task, see sweep.task_key.
+
+    Returns:
+        List with the result of every task.
+    """
+
+    index = {}
+    for path in _shards(func.__name__ for func in funcs):
+        with np.load(path) as shard:
+            for row, key in enumerate(shard['key']):
+                index[key] = (path, row)
+
+    missing = sum(key not in index for key in keys)
+    if missing:
+        raise RuntimeError('%d results are not in the store %s, run the sweep once without rendering only'
+                           % (missing, directory()))
+
+    loaded = {}
+    results = []
+    for key in keys:
+        path, row = index[key]
+        if path not in loaded:
+            with np.load(path) as shard:
+                loaded[path] = shard['result']
+        results.append(loaded[path][row].tolist())
+    return results
+
+def query(algorithm, columns = ('result',), **params):
+    """
+    Reads the stored results of one algorithm at the parameter points that match, e.g. every gap of ucb_normal at
+    a horizon of 1000 with query(ucb_normal, ('mu2', 'result'), n = 1000). Only the requested columns and those
+    that are matched on are read from the shards.
+
+    Args:
+        algorithm: simulation function or its name.
+        columns: names of the columns to read, 'key', 'result' or an argument of the function.
+        params: values that arguments of the function must have.
+
+    Returns:
+        Dictionary with an array of every column, one entry per matching task, the latest result of every task.
+    """
+
+    name = getattr(algorithm, '__name__', algorithm)
+    keys = []
+    parts = {column: [] for column in columns}
+    for path in _shards([name]):
+        with np.load(path) as shard:
+            stored = shard['key']
+            mask = np.ones(len(stored), dtype = bool)
+            for argument, value in params.items():
+                values = shard[argument]
+                mask &= values == (float(value) if values.dtype.kind == 'f' else str(value))
+            keys.extend(stored[mask])
+            for column in columns:
+                parts[column].append(shard[column][mask])
+
+    # later shards replace earlier results of the same task
+    order = sorted({key: i for i, key in enumerate(keys)}.values())
+    return {column: np.concatenate(parts[column])[order] if parts[column] else np.empty(0) for column in columns}
@@ -0,0 +1,541 @@
+import os
+import time
+import pickle
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import etc
+import rng
+import store
+import atomic
+from moments import Moments
+from cache import open_cache, key as cache_key
+
+# seconds per round, simulation and arm of every family of algorithms, measured on one core and refined by sweep
+_rates = {'klucb': 4e-7, 'thompson': 2e-7, 'lin_': 6e-6, 'etc': 5e-8}
+_default_rate = 1.2e-7
+
+def _units(func, args):
+    """
+    Helper function that measures the work of a task as the number of rounds times simulations times arms, for every
+    configuration of arms the task simulates at once. Explore-then-commit only draws the rounds of its largest
+    exploration rate and then commits every rate of its grid, one more unit per rate.
+    """
+
+    arguments = inspect.signature(func).bind(*args).arguments
+    configs, arms = 1, 2
+    if 'mu1' in arguments:
+        configs = np.broadcast(arguments['mu1'], arguments['mu2']).size
+    elif 'true_mus' in arguments:
+        # normal arms hold a mean and a variance, like their priors, bernoulli arms only a mean
+        arms = len(arguments['priors'])
+        configs = np.size(arguments['true_mus']) // (np.size(arguments['priors']) if 'normal' in func.__name__ 
+                                                      else arms)
+    elif 'mus' in arguments:
+        shape = np.shape(arguments['mus'])
+        configs, arms = int(np.prod(shape[:-1])), shape[-1]
+    elif 'a' in arguments:
+        arms = len(arguments['a'])
+
+    rounds, rates = arguments.get('n', 1), 0
+    if 'ms' in arguments or 'm' in arguments:
+        ms = arguments['ms'] if 'ms' in arguments else [arguments['m']]
+        rounds = max(etc._exploration_rates(mu2, ms, rounds).max() for mu2 in np.atleast_1d(arguments['mu2']))
+        rates = len(ms)
+    return arguments.get('numsim', 1) * configs * (rounds * arms + rates)
+
+def _family(func):
+    """
+    Helper function that finds the family of algorithms a function belongs to in the cost model.
+    """
+
+    for family in _rates:
+        if func.__name__.startswith(family):
+            return family
+    return func.__name__
+
+def estimate(func, args):
+    """
+    Estimates the run time of a task in seconds from the cost model.
+
+    Args:
+        func: simulation function.
+        args: arguments of the function.
+
+    Returns:
+        The estimated run time in seconds.
+    """
+
+    return _rates.get(_family(func), _default_rate) * _units(func, args)
+
+def _observe(func, args, seconds):
+    """
+    Helper function that refines the cost model with the measured run time of a task, averaging the measured rate
+    into the rate of its family of algorithms.
+    """
+
+    units = _units(func, args)
+    if units and seconds > 0:
+        family = _family(func)
+        _rates[family] = 0.5 * _rates.get(family, _default_rate) + 0.5 * seconds / units
+
+def merge_moments(results, counts):
+    """
+    Merges the [average regret, regret variance] results of chunks of simulations into the result of all of them,
+    combining their Moments with the pairwise formula of Chan et al.
+
+    Args:
+        results: list with the result of every chunk.
+        counts: list with the number of simulations of every chunk.
+
+    Returns:
+        The average regret and regret variance across all chunks.
+    """
+
+    total = Moments()
+    for result, count in zip(results, counts):
+        total.merge(Moments.from_summary(result, count))
+    return total.summary()
+
+def merge_means(results, counts):
+    """
+    Merges results that hold only average regrets, e.g. one for every exploration rate of etc_normal_grid.
+
+    Args:
+        results: list with the result of every chunk.
+        counts: list with the number of simulations of every chunk.
+
+    Returns:
+        List with the average regrets across all chunks.
+    """
+
+    return (np.asarray(counts) @ np.asarray(results) / sum(counts)).tolist()
+
+def merge_for(func):
+    """
+    Finds how the chunks of a simulation function merge: the ETC simulations return only average regrets, one for
+    every exploration rate of the grid functions, and every other algorithm returns its average regret and regret
+    variance.
+
+    Args:
+        func: simulation function.
+
+    Returns:
+        merge_means or merge_moments.
+    """
+
+    return merge_means if _family(func) == 'etc' else merge_moments
+
+def summarize(func, regrets):
+    """
+    Finds the result of a task from the regret of every simulation, in the form the function itself returns it.
+
+    Args:
+        func: simulation function.
+        regrets: array with the simulations along its first axis, e.g. collected from the job queue.
+
+    Returns:
+        The average regret of every exploration rate for the ETC simulations, see merge_for, and the average regret 
+        and regret variance for every other algorithm.
+    """
+
+    if merge_for(func) is merge_means:
+        return np.mean(regrets, axis = 0).tolist()
+    return Moments().update(regrets).summary()
+
+def chunked(func, args, threads, seed = None, merge = None):
+    """
+    Runs one simulation task with its simulations split into chunks that run on a pool of threads. numpy releases
+    the GIL inside its array operations, so the chunks of the vectorized algorithms run in parallel without the cost
+    of starting processes. Chunks start at multiples of rng.BLOCK and use the streams of their own blocks, so every
+    simulation draws the same numbers for any number of threads and the merged statistics only differ by rounding.
+    Functions without a numsim argument, e.g. etc_normal_exact, run in one piece.
+
+    Args:
+        func: simulation function with a numsim and a seed argument, e.g. ucb_normal.
+        args: arguments of the function, without the seed.
+        threads (int): number of threads.
+        seed: seed of the random number streams, None to use fresh entropy.
+        merge: function of (results, counts) that merges the results of the chunks, merge_moments or merge_means,
+            None to pick it from the function, see merge_for.
+
+    Returns:
+        The merged result of the function.
+    """
+
+    signature = inspect.signature(func)
+    if threads == 1 or 'numsim' not in signature.parameters:
+        return func(*args, seed = seed)
+    numsim = signature.bind(*args).arguments['numsim']
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
+    # split simulations into at most one chunk per thread, each a whole number of blocks
+    blocks = -(-numsim // rng.BLOCK)
+    size = -(-blocks // threads) * rng.BLOCK
+    starts = list(range(0, numsim, size))
+    counts = [min(size, numsim - start) for start in starts]
+    if len(starts) == 1:
+        return func(*args, seed = seed)
+    merge = merge or merge_for(func)
+
+    # arguments of every chunk with its own number of simulations
+    chunks = []
+    for start, count in zip(starts, counts):
+        bound = signature.bind(*args)
+        bound.arguments['numsim'] = count
+        chunks.append((bound.args, rng.Chunk(seed, start)))
+
+    with ThreadPoolExecutor(max_workers = len(chunks)) as pool:
+        results = list(pool.map(lambda chunk: func(*chunk[0], seed = chunk[1]), chunks))
+    return merge(results, counts)
+
+def _run(task):
+    """
+    Helper function that runs one task with its own seed.
+
+    Args:
+        task: tuple of (seed, function, arguments, threads, merge).
+
+    Returns:
+        The result of the function and its run time in seconds.
+    """
+
+    seed, func, args, threads, merge = task
+    start = time.perf_counter()
+    if threads > 1:
+        result = chunked(func, args, threads, seed, merge)
+    else:
+        result = func(*args, seed = seed)
+    return result, time.perf_counter() - start
+
+def task_key(func, args, seed):
+    """
+    Identifies a task by its function, arguments and seed.
+
+    Args:
+        func: simulation function.
+        args: arguments of the function.
+        seed: seed of the task.
+
+    Returns:
+        Hex digest that is the same in every process and on every host.
+    """
+
+    return hashlib.sha1(pickle.dumps((func.__module__, func.__qualname__, args, seed))).hexdigest()
+
+def task_seed(func, args, seed):
+    """
+    Derives the seed of a task from its function and arguments, so a task draws the same numbers in every sweep it
+    is part of, wherever it sits in the list of tasks, and its cached result stays valid when points are added.
+
+    Args:
+        func: simulation function.
+        args: arguments of the function.
+        seed (int): seed of the sweep.
+
+    Returns:
+        The seed of the task, a list of two ints.
+    """
+
+    return [seed, int(task_key(func, args, None)[:15], 16)]
+
+def point_seed(args, seed):
+    """
+    Derives the seed of the common reward table of a parameter point from its arguments alone, so every algorithm 
+    that runs at the point reads the same rewards, see crn.RewardTable.
+
+    Args:
+        args: arguments of the point.
+        seed (int): seed of the sweep.
+
+    Returns:
+        The seed of the table, a list of two ints.
+    """
+
+    return [seed, int(hashlib.sha1(pickle.dumps(args)).hexdigest()[:15], 16)]
+
+def _seed(func, args, seed, common):
+    """
+    Helper function that finds the seed a task runs with, an rng.Common when its point uses a common reward table.
+    """
+
+    if not common:
+        return task_seed(func, args, seed)
+    return rng.Common(task_seed(func, args, seed), point_seed(args, seed))
+
+class _Checkpoint:
+    """
+    Results of the finished tasks of one sweep, kept in a file named after the keys of all its tasks. The file is 
+    rewritten at most every interval seconds and once more when the sweep ends, so a sweep that is killed only 
+    loses the tasks finished since the last save and picks up the saved ones when it runs again.
+    
+    Args:
+        directory: directory of the checkpoint files, None to keep nothing.
+        keys: list with the key of every task of the sweep.
+        interval (float): least number of seconds between two saves.
+    """
+    
+    def __init__(self, directory, keys, interval):
+        self.path = None
+        self.interval = interval
+        self.results = {}
+        self.saved = time.time()
+        if directory:
+            name = hashlib.sha1(' '.join(keys).encode()).hexdigest()
+            self.path = os.path.join(directory, name + '.pkl')
+            if os.path.exists(self.path):
+                with open(self.path, 'rb') as file:
+                    self.results = pickle.load(file)
+    
+    def record(self, key, result):
+        """
+        Stores the result of a finished task and saves the checkpoint once interval seconds passed since the last.
+        """
+        
+        self.results[key] = result
+        if time.time() - self.saved >= self.interval:
+            self.save()
+    
+    def save(self):
+        """
+        Writes the results to a temporary file first, so a kill while saving leaves the last checkpoint intact.
+        """
+        
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok = True)
+        atomic.write(self.path, lambda file: pickle.dump(self.results, file))
+        self.saved = time.time()
+
+def _checkpoint(keys, checkpoint, interval):
+    """
+    Helper function that opens the checkpoint of a sweep, from the BANDIT_CHECKPOINT and BANDIT_CHECKPOINT_INTERVAL 
+    environment variables unless they are given.
+    """
+    
+    directory = checkpoint or os.environ.get('BANDIT_CHECKPOINT')
+    if interval is None:
+        interval = float(os.environ.get('BANDIT_CHECKPOINT_INTERVAL', 60))
+    return _Checkpoint(directory, keys, interval)
+
+def sweep(tasks, workers = 1, seed = 0, threads = 1, merge = None, checkpoint = None, interval = None,
+          cache = None, common = False, database = None):
+    """
+    Runs a list of simulation tasks, fanned out to a pool of processes when more than one worker is given. Every task
+    runs with the random number streams of its own seed, see task_seed, so the results are identical for any number
+    of workers and any order of the tasks. Tasks whose result is in the result cache are not run again. The results
+    are appended to the results store, and when rendering only they are read back from it without running anything.
+
+    Tasks are handed to the workers longest first, by the run time the cost model estimates from the algorithm and
+    its rounds, simulations and arms, so no worker is left with a long task at the end. The measured run times
+    refine the cost model for later sweeps in the same process.
+
+    With a database, the tasks that take numsim and out arguments are split into shards of simulations in a SQLite 
+    job queue instead, like in sweep_shared, and tasks without them, e.g. etc_normal_exact, still run here.
+
+    Args:
+        tasks: list of (function, arguments) tuples, for example (ucb_bernoulli, (0.5, 0.6, n, numsim)).
+        workers (int): number of processes, 1 to run the tasks in the current process.
+        seed (int): seed that the seed of every task is derived from.
+        threads (int): number of threads that split the simulations of every task, see chunked.
+        merge: function that merges the results of the chunks of every task, None to pick it from the function of
+            each task, see chunked.
+        checkpoint: directory where the results of finished tasks are saved and resumed from, defaults to the 
+            BANDIT_CHECKPOINT environment variable, None to keep no checkpoint.
+        interval (float): least number of seconds between two checkpoints, defaults to the 
+            BANDIT_CHECKPOINT_INTERVAL environment variable or 60.
+        cache: directory of the result cache, defaults to the BANDIT_CACHE environment variable, None to cache 
+            nothing, see cache.open_cache.
+        common (bool): read the rewards of every task from the common reward table of its arguments, so tasks of 
+            different algorithms with the same arguments see the same rewards, see point_seed.
+        database: path of the job queue database, defaults to the BANDIT_QUEUE environment variable, None to run the 
+            tasks here.
+
+    Returns:
+        List with the result of every task, in the order of the tasks.
+    """
+
+    jobs = [(_seed(func, args, seed, common), func, args, threads, merge) for func, args in tasks]
+    keys = [task_key(func, args, job_seed) for job_seed, func, args, _, _ in jobs]
+    if store.render_only():
+        return store.lookup([job[1] for job in jobs], keys)
+    saved = _checkpoint(keys, checkpoint, interval)
+    results = [saved.results.get(key) for key in keys]
+    remaining = [i for i, key in enumerate(keys) if key not in saved.results]
+
+    # read back the tasks that any earlier sweep already ran
+    stored = open_cache(cache)
+    addresses = {i: cache_key(jobs[i][1], jobs[i][2], jobs[i][0]) for i in remaining}
+    for i in list(remaining):
+        entry = stored.load(addresses[i])
+        if entry is not None:
+            results[i] = entry[0]
+            remaining.remove(i)
+
+    def finish(i, result, seconds):
+        results[i] = result
+        _observe(jobs[i][1], jobs[i][2], seconds)
+        saved.record(keys[i], result)
+        stored.store(addresses[i], result)
+
+    # tasks that can be split into shards go through the job queue when there is one
+    local = remaining
+    database = database or os.environ.get('BANDIT_QUEUE')
+    if database:
+        import jobqueue
+        queued = [i for i in remaining if {'numsim', 'out'} <= set(inspect.signature(jobs[i][1]).parameters)]
+        local = [i for i in remaining if i not in queued]
+        regrets = []
+        if queued:
+            regrets = jobqueue.run(database, [(jobs[i][1], jobs[i][2], jobs[i][0]) for i in queued], workers)
+        for i, regret in zip(queued, regrets):
+            results[i] = summarize(jobs[i][1], regret)
+            saved.record(keys[i], results[i])
+            stored.store(addresses[i], results[i], regret)
+
+    if workers == 1:
+        for i in local:
+            finish(i, *_run(jobs[i]))
+    else:
+
+        # submit the most expensive tasks first
+        order = sorted(local, key = lambda i: estimate(jobs[i][1], jobs[i][2]), reverse = True)
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            futures = {pool.submit(_run, jobs[i]): i for i in order}
+            for future in as_completed(futures):
+                finish(futures[future], *future.result())
+    if remaining:
+        saved.save()
+    store.append([job[1] for job in jobs], [job[2] for job in jobs], keys, results)
+    return results
+
+def _run_shared(task):
+    """
+    Helper function that runs one task and writes the regret of every simulation into its slice of the shared block.
+
+    Args:
+        task: tuple of (seed, function, arguments, name of the shared block, shape of the block, index of the slice).
+
+    Returns:
+        The run time of the task in seconds.
+    """
+
+    seed, func, args, name, shape, index = task
+    start = time.perf_counter()
+    memory = shared_memory.SharedMemory(name = name)
+    try:
+        block = np.ndarray(shape, dtype = float, buffer = memory.buf)
+        func(*args, seed = seed, out = block[index])
+        del block
+    finally:
+        memory.close()
+    return time.perf_counter() - start
+
+def sweep_shared(algorithms, params, workers = 1, seed = 0, database = None, checkpoint = None, interval = None,
+                 cache = None, common = False):
+    """
+    Runs every algorithm at every parameter point like sweep, but the regret of every simulation is written straight 
+    into a block of shared memory of shape (algorithms, parameters, numsim) instead of being sent back through a 
+    pipe. Workers only return their run time, and the summaries are computed from slices of the block. Every task 
+    runs with the seed sweep gives it, see task_seed, so the summaries match those of sweep over the same tasks. 
+    The result cache keeps the regret of every simulation along with the summary of a task, and the summaries are
+    appended to the results store or read back from it like in sweep.
+
+    With a database, the tasks are split into shards of simulations in a SQLite job queue instead, see jobqueue, 
+    and workers on every host pointed at the same file share them.
+
+    Args:
+        algorithms: list of simulation functions with numsim, seed and out arguments, e.g. [ucb_normal, moss_normal].
+        params: list of argument tuples that every algorithm runs with, e.g. [(0, mu, n, numsim) for mu in mu2s].
+        workers (int): number of processes, 1 to run the tasks in the current process.
+        seed (int): seed that the seed of every task is derived from.
+        database: path of the job queue database, defaults to the BANDIT_QUEUE environment variable, None to run the 
+            tasks here.
+        checkpoint: directory where the summaries of finished tasks are saved and resumed from, see sweep.
+        interval (float): least number of seconds between two checkpoints, see sweep.
+        cache: directory of the result cache, see sweep.
+        common (bool): every algorithm at a parameter point reads the same rewards from the common reward table of 
+            the point, so differences between the algorithms are not buried in the noise of independent draws.
+
+    Returns:
+        List with a list for every algorithm of the average regret and regret variance at every parameter point.
+    """
+
+    jobs = []
+    for p, args in enumerate(params):
+        for a, func in enumerate(algorithms):
+            jobs.append((_seed(func, args, seed, common), func, args, (a, p)))
+    numsims = {inspect.signature(func).bind(*args).arguments['numsim'] for _, func, args, _ in jobs}
+    if len(numsims) != 1:
+        raise ValueError('every task of a shared sweep must run the same number of simulations')
+    shape = (len(algorithms), len(params), numsims.pop())
+
+    keys = [task_key(func, args, job_seed) for job_seed, func, args, _ in jobs]
+    results = [[None] * shape[1] for _ in range(shape[0])]
+    if store.render_only():
+        for (_, _, _, (a, p)), result in zip(jobs, store.lookup([job[1] for job in jobs], keys)):
+            results[a][p] = result
+        return results
+
+    saved = _checkpoint(keys, checkpoint, interval)
+    for key, (_, _, _, (a, p)) in zip(keys, jobs):
+        results[a][p] = saved.results.get(key)
+    remaining = [i for i, key in enumerate(keys) if key not in saved.results]
+
+    # read back the tasks that any earlier sweep already ran
+    stored = open_cache(cache)
+    addresses = {i: cache_key(jobs[i][1], jobs[i][2], jobs[i][0]) for i in remaining}
+    for i in list(remaining):
+        entry = stored.load(addresses[i])
+        if entry is not None:
+            a, p = jobs[i][3]
+            results[a][p] = entry[0]
+            remaining.remove(i)
+
+    database = database or os.environ.get('BANDIT_QUEUE')
+    if remaining and database:
+        import jobqueue
+        regrets = jobqueue.run(database, [(jobs[i][1], jobs[i][2], jobs[i][0]) for i in remaining], workers)
+        for i, regret in zip(remaining, regrets):
+            a, p = jobs[i][3]
+            results[a][p] = Moments().update(regret).summary()
+            saved.record(keys[i], results[a][p])
+            stored.store(addresses[i], results[a][p], regret)
+        saved.save()
+    elif remaining:
+        memory = shared_memory.SharedMemory(create = True, size = max(1, int(np.prod(shape)) * 8))
+        try:
+            block = np.ndarray(shape, dtype = float, buffer = memory.buf)
+            tasks = [(job_seed, func, args, memory.name, shape, index) for job_seed, func, args, index in jobs]
+
+            def finish(i, seconds):
+                # summarize the slice of a finished task without copying it
+                _observe(tasks[i][1], tasks[i][2], seconds)
+                a, p = tasks[i][5]
+                results[a][p] = Moments().update(block[a, p]).summary()
+                saved.record(keys[i], results[a][p])
+                stored.store(addresses[i], results[a][p], block[a, p])
+
+            order = sorted(remaining, key = lambda i: estimate(tasks[i][1], tasks[i][2]), reverse = True)
+            if workers == 1:
+                for i in order:
+                    finish(i, _run_shared(tasks[i]))
+            else:
+                with ProcessPoolExecutor(max_workers = workers) as pool:
+                    futures = {pool.submit(_run_shared, tasks[i]): i for i in order}
+                    for future in as_completed(futures):
+                        finish(futures[future], future.result())
+            saved.save()
+        finally:
+            block = None
+            memory.close()
+            memory.unlink()
+
+    store.append([job[1] for job in jobs], [job[2] for job in jobs], keys,
+                 [results[a][p] for _, _, _, (a, p) in jobs])
+    return results
@@ -0,0 +1,61 @@
+import numpy as np
+
+import budget
+
+def create(path, n, numsim, configs = ()):
+    """
+    Creates a file that records the cumulative regret of every simulation after every round, as a float32 .npy file
+    mapped into memory, so trajectories far larger than the memory only ever hold the pages being written. Rounds
+    come first and simulations last, so the simulations of one round sit next to each other. Pass the result as the
+    trajectory argument of a simulation function.
+
+    Args:
+        path: path of the .npy file.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        configs: shape of the configurations between rounds and simulations, e.g. (len(mu2s),) for a batched call
+            or (len(ms),) for etc_normal_grid, () for a single configuration.
+
+    Returns:
+        Array of shape (n,) + configs + (numsim,) backed by the file.
+    """
+
+    return np.lib.format.open_memmap(path, mode = 'w+', dtype = np.float32, shape = (n,) + tuple(configs) + (numsim,))
+
+def load(path):
+    """
+    Opens a trajectory file read only, without reading it into memory.
+
+    Args:
+        path: path of the .npy file.
+
+    Returns:
+        Array of shape (n,) + configs + (numsim,) backed by the file.
+    """
+
+    return np.load(path, mmap_mode = 'r')
+
+def summary(trajectory, quantiles = (0.05, 0.5, 0.95), memory = None):
+    """
+    Streams the average regret and the regret quantiles of every round out of a trajectory, reading as many rounds
+    at a time as fit the memory budget.
+
+    Args:
+        trajectory: array of shape (n,) + configs + (numsim,), e.g. returned by create or load.
+        quantiles: list of quantiles to find, between 0 and 1.
+        memory: memory budget, see budget.limit.
+
+    Returns:
+        Tuple of the average regret, an array of shape (n,) + configs, and the quantiles, an array of shape
+        (len(quantiles), n) + configs.
+    """
+
+    # a chunk of rounds is held as float64 along with the sorted copy np.quantile makes
+    rounds = max(1, budget.limit(memory) // (16 * max(1, trajectory[0].size)))
+    mean = np.empty(trajectory.shape[:-1])
+    quantile = np.empty((len(quantiles),) + trajectory.shape[:-1])
+    for first in range(0, len(trajectory), rounds):
+        chunk = np.asarray(trajectory[first:first + rounds], dtype = float)
+        mean[first:first + rounds] = chunk.mean(axis = -1)
+        quantile[:, first:first + rounds] = np.quantile(chunk, quantiles, axis = -1)
+    return mean, quantile
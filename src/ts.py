@@ -1,5 +1,149 @@
 import numpy as np
 import math
+from statistics import NormalDist
+
+import budget
+import crn
+from moments import Moments
+import rng
+
+# number of arrays of shape (numsim, arms) a chunk of simulations holds, with the temporaries of a round
+_STATE = 12
+
+def _sample_normal(generator, count, mu, scale):
+    """
+    Helper function that draws one normal sample per entry of mu for rng.draw.
+    """
+    
+    return generator.normal(mu, scale)
+
+class _Candidates:
+    """
+    Arms that are still sampled in every simulation when pruning, as a (numsim, columns) array of arm indices with a 
+    mask of the entries in use, along with a (numsim, arms) mask of the candidates and the column of every arm. An 
+    arm is pruned once its upper quantile falls below the threshold of its simulation, which never exceeds the lower 
+    quantile of its leader, a candidate whose lower quantile reaches the threshold. Pruned arms are not pulled, so 
+    their quantiles never change, and every round only updates the pulled arm: it checks the candidates of a 
+    simulation only when the pulled arm raises its threshold, looks for a new leader among them only when the 
+    leader's lower quantile falls below the threshold, and scans all arms of a simulation only when no candidate 
+    reaches it any more. The threshold is set half a quantile width below the lower quantile of the arm that sets 
+    it and only raised once an arm clears it by a whole width, so neither small drops nor small rises of the 
+    quantiles touch the other candidates. Pruning less than possible only keeps extra candidates.
+    
+    Args:
+        upper: array of shape (numsim, arms) with the upper quantile of every arm, kept up to date by the caller.
+        lower: array of shape (numsim, arms) with the lower quantile of every arm, kept up to date by the caller.
+    """
+    
+    def __init__(self, upper, lower):
+        self.upper = upper
+        self.lower = lower
+        self.rows = np.arange(len(upper))[:, None]
+        self.threshold = np.empty(len(upper))
+        self.top = np.empty(len(upper))
+        self.leader = np.empty(len(upper), dtype = int)
+        self.count = np.empty(len(upper), dtype = int)
+        self.mask = np.empty(upper.shape, dtype = bool)
+        self.column = np.zeros(upper.shape, dtype = int)
+        self.arms = np.zeros((len(upper), 0), dtype = int)
+        self.valid = np.zeros((len(upper), 0), dtype = bool)
+        self._scan(self.rows[:, 0])
+    
+    def _scan(self, sims):
+        """
+        Helper function that finds the leader, threshold and candidates of the given simulations from all arms.
+        """
+        
+        upper, lower = self.upper[sims], self.lower[sims]
+        self.leader[sims] = np.argmax(lower, axis = 1)
+        self.top[sims] = lower[np.arange(len(sims)), self.leader[sims]]
+        width = upper[np.arange(len(sims)), self.leader[sims]] - self.top[sims]
+        self.threshold[sims] = self.top[sims] - width / 2
+        self.mask[sims] = upper >= self.threshold[sims, None]
+        self.count[sims] = self.mask[sims].sum(axis = 1)
+        
+        # widen every row when a simulation has more candidates than columns
+        columns = max(self.arms.shape[1], self.count[sims].max())
+        if columns > self.arms.shape[1]:
+            extra = columns - self.arms.shape[1]
+            self.arms = np.pad(self.arms, ((0, 0), (0, extra)))
+            self.valid = np.pad(self.valid, ((0, 0), (0, extra)))
+        self.arms[sims] = np.argsort(~self.mask[sims], axis = 1, kind = 'stable')[:, :columns]
+        self.valid[sims] = np.arange(columns) < self.count[sims, None]
+        self.column[sims[:, None], self.arms[sims]] = np.arange(columns)
+    
+    def update(self, sims, pulled):
+        """
+        Prunes and restores arms after the quantiles of the pulled arm of every simulation changed.
+        """
+        
+        upper, lower = self.upper[sims, pulled], self.lower[sims, pulled]
+        changed = False
+        
+        # the pulled arm is pruned when its upper quantile fell below the threshold
+        dropped = np.flatnonzero(upper < self.threshold)
+        if len(dropped):
+            self.valid[dropped, self.column[dropped, pulled[dropped]]] = False
+            self.mask[dropped, pulled[dropped]] = False
+            self.count[dropped] -= 1
+            changed = True
+        
+        # a threshold a whole quantile width higher from the pulled arm prunes candidates of its simulation
+        raised = np.flatnonzero(lower - (upper - lower) > self.threshold)
+        if len(raised):
+            self.threshold[raised] = lower[raised] - (upper[raised] - lower[raised]) / 2
+            arms = self.arms[raised]
+            valid = self.valid[raised]
+            kept = valid & (self.upper[raised[:, None], arms] >= self.threshold[raised, None])
+            pruned = valid & ~kept
+            self.mask[np.broadcast_to(raised[:, None], arms.shape)[pruned], arms[pruned]] = False
+            self.valid[raised] = kept
+            self.count[raised] = kept.sum(axis = 1)
+            changed = True
+        
+        # the pulled arm takes the lead when its lower quantile is higher, and the leader keeps it while it reaches 
+        # the threshold even when another candidate is higher
+        moved = (pulled == self.leader) | (lower > self.top)
+        self.leader = np.where(moved, pulled, self.leader)
+        self.top = np.where(moved, lower, self.top)
+        
+        # pruned arms stay below the threshold, so it is only valid while a candidate reaches it
+        fell = np.flatnonzero(self.top < self.threshold)
+        if len(fell):
+            candidates = np.where(self.valid[fell], self.lower[fell[:, None], self.arms[fell]], -np.inf)
+            best = np.argmax(candidates, axis = 1)
+            self.top[fell] = candidates[np.arange(len(fell)), best]
+            self.leader[fell] = self.arms[fell, best]
+            stale = fell[self.top[fell] < self.threshold[fell]]
+            if len(stale):
+                self._scan(stale)
+                changed = True
+        
+        # drop the columns that no simulation uses any more once they are the majority
+        if changed and 2 * self.count.max() <= self.arms.shape[1]:
+            columns = self.count.max()
+            order = np.argsort(~self.valid, axis = 1, kind = 'stable')[:, :columns]
+            self.arms = self.arms[self.rows, order]
+            self.valid = self.valid[self.rows, order]
+            self.column[self.rows, self.arms] = np.arange(columns)
+    
+    def sample(self, rngs, post_mus, post_vars):
+        """
+        Draws a posterior sample of every candidate and finds the arm with the highest sample in every simulation. 
+        While more than a quarter of the arms of a block of simulations are candidates, every arm of the block is 
+        sampled, which is cheaper than gathering the candidates.
+        """
+        
+        def sampler(generator, count, mu, scale, mask, candidates, arms, valid):
+            if 4 * candidates.sum() > mu.size:
+                return np.argmax(np.where(mask, generator.normal(mu, scale), -np.inf), axis = 1)
+            rows, columns = np.nonzero(valid)
+            chosen = arms[rows, columns]
+            samples = np.full(arms.shape, -np.inf)
+            samples[rows, columns] = generator.normal(mu[rows, chosen], scale[rows, chosen])
+            return arms[np.arange(count), np.argmax(samples, axis = 1)]
+        
+        return rng.draw(rngs, sampler, post_mus, post_vars, self.mask, self.count, self.arms, self.valid)
 
 def posterior_normal(mu, prior_var, sig_var, reward):
     """
@@ -20,66 +164,169 @@ def posterior_normal(mu, prior_var, sig_var, reward):
     mu1_prior_var = (1 / sig_var + 1 / prior_var)**-1
     return mu1_prior, mu1_prior_var
 
-def thompson_normal(true_mus, priors, n, numsim):
+def prune_level(arms, error = 1e-4):
+    """
+    Finds the number of standard deviations to prune arms with in thompson_normal_k, so that pruning changes the 
+    chosen arm with probability at most error per round, by the union bound over all arms.
+    
+    Args:
+        arms(int): number of arms.
+        error(float): largest probability per round that pruning changes the chosen arm.
+    
+    Returns:
+        The number of standard deviations z, with arms * (1 - Phi(z)) = error.
+    """
+    
+    return NormalDist().inv_cdf(1 - error / arms)
+
+def thompson_normal_k(true_mus, priors, n, numsim, prune = None, seed = None, out = None, memory = None, 
+                      trajectory = None):
+    """
+    Implementation of the Thompson Sampling algorithm with any number of arms that all follow a normal distribution. 
+    Every simulation of a chunk is stepped together, with the posterior mean and variance of each arm kept in arrays 
+    of shape (numsim, arms). As in thompson_normal, the posterior variance is used as the scale of the posterior 
+    samples. Several configurations of arms, for example one for every gap of a plot, are stepped together as well, 
+    and configuration g draws from the random number streams of point g, see rng.grid.
+    
+    With prune set to a number of standard deviations z, an arm stops being sampled once its upper quantile 
+    mean + z * scale falls below the lower quantile mean - z * scale of another arm of the simulation, see 
+    _Candidates. A pruned arm can only have been chosen if its own sample lands above its upper quantile or the 
+    sample of that other arm lands below its lower quantile, so by the union bound pruning changes the choice with 
+    probability at most (1 + pruned arms) * (1 - Phi(z)) per round, up to arms * (1 - Phi(z)). z must grow with the 
+    number of arms, like sqrt(2 * log(arms / error)), and prune_level finds the z that keeps the bound below a given 
+    error, e.g. prune_level(1000) is about 5.2. A fixed z = 3 allows up to 1000 * 1.3e-3 per round with 1000 arms, 
+    no bound at all, and moves the average regret by several standard errors. Pruning pays off once the lower 
+    quantiles of the best arms clear the upper quantile of the prior: 1000 arms with means from 0 to 10 and 
+    priors (0, 1) run about six times faster with prune_level(1000), while with means from 0 to 1 almost no arm is 
+    ever pruned.
+    
+    Args:
+        true_mus: list with a tuple for every arm that includes its mean and variance, or a list of such lists to 
+            simulate several configurations at once.
+        priors: list with a tuple for every arm that includes its prior mean and variance.
+        n(int): horizon.
+        numsim(int): number of simulations.
+        prune(float): number of standard deviations used to prune arms, e.g. prune_level(arms), None to sample every 
+            arm every round.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim,), or (configurations, numsim), that receives the regret of every simulation, 
+            None to skip it.
+        memory: memory budget of the simulations, see budget.limit. Simulations run in chunks of whole random number 
+            blocks that fit it, which leaves every regret unchanged.
+        trajectory: array of shape (n, numsim), or (n, configurations, numsim), that receives the cumulative regret 
+            of every simulation after every round, see trajectory.create, None to skip it.
+        
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    true_mus = np.asarray(true_mus, dtype = float)
+    configs = true_mus.reshape((-1,) + true_mus.shape[-2:])
+    if trajectory is not None:
+        trajectory = trajectory.reshape(n, len(configs), numsim)
+    
+    # simulations run in chunks that fit the memory budget, only the moments of their regrets are kept
+    moments = Moments()
+    per_sim = (8 * _STATE + (crn.STATE if crn.common(seed) else 0)) * configs[..., 0].size
+    for start, count in budget.split(numsim, per_sim, memory):
+        paths = None if trajectory is None else trajectory[:, :, start:start + count]
+        chunk = _thompson_normal(configs, priors, n, count, prune, rng.Chunk(seed, start), paths, memory)
+        moments.update(chunk.reshape(len(configs), count))
+        if out is not None:
+            out.reshape(len(configs), numsim)[:, start:start + count] = chunk.reshape(len(configs), count)
+    
+    # find and return average regret and variance across simulations
+    if true_mus.ndim < 3:
+        return list(moments.summary()[0])
+    return moments.summary()
+
+def _thompson_normal(configs, priors, n, numsim, prune, seed, trajectory = None, memory = None):
+    """
+    Helper function that steps one chunk of simulations of thompson_normal_k together, for every configuration of 
+    arms, and returns the regret of each. The cumulative regret after every round goes to trajectory, of shape 
+    (n, configurations, numsim), when it is given. With an rng.Common seed, rewards are read from its common reward 
+    table, see crn.RewardTable, and only the posterior samples come from the streams of the simulations.
+    """
+    
+    rngs = rng.grid(seed, numsim, len(configs))
+    table = crn.table(seed, numsim, configs.shape[1], len(configs), memory)
+    
+    # store true means and variances, one row for every simulation of every configuration
+    mus = np.repeat(configs[:, :, 0], numsim, axis = 0)
+    sig_vars = np.repeat(configs[:, :, 1], numsim, axis = 0)
+    sims = np.arange(len(mus))
+    
+    # store prior means and variances for every simulation
+    post_mus = np.tile(np.array([prior[0] for prior in priors], dtype = float), (len(mus), 1))
+    post_vars = np.tile(np.array([prior[1] for prior in priors], dtype = float), (len(mus), 1))
+    
+    # initialize and set individual arm selections to 0
+    selections = np.zeros(mus.shape)
+    
+    # quantiles used to prune arms, only the entries of pulled arms change
+    if prune is not None:
+        upper = post_mus + prune * post_vars
+        lower = post_mus - prune * post_vars
+        candidates = _Candidates(upper, lower)
+    
+    # find true reward
+    true_reward = mus.max(axis = 1) * n
+    if trajectory is not None:
+        best = mus.max(axis = 1)
+        earned = np.zeros(len(mus))
+    for t in range(n):
+        
+        # sample from the posterior distributions and choose the arm with the highest sample
+        if prune is None:
+            pulled = np.argmax(rng.draw(rngs, _sample_normal, post_mus, post_vars), axis = 1)
+        else:
+            pulled = candidates.sample(rngs, post_mus, post_vars)
+        
+        # observe reward and update the posterior of the pulled arm only
+        if table is None:
+            reward = rng.draw(rngs, _sample_normal, mus[sims, pulled], sig_vars[sims, pulled])
+        else:
+            reward = mus[sims, pulled] + sig_vars[sims, pulled] * table.normal(sims, pulled, selections[sims, pulled])
+        post_mus[sims, pulled], post_vars[sims, pulled] = posterior_normal(post_mus[sims, pulled], 
+                                                                           post_vars[sims, pulled], 
+                                                                           sig_vars[sims, pulled], reward)
+        selections[sims, pulled] += 1
+        if prune is not None:
+            upper[sims, pulled] = post_mus[sims, pulled] + prune * post_vars[sims, pulled]
+            lower[sims, pulled] = post_mus[sims, pulled] - prune * post_vars[sims, pulled]
+            candidates.update(sims, pulled)
+        if trajectory is not None:
+            earned += mus[sims, pulled]
+            trajectory[t] = (best * (t + 1) - earned).reshape(len(configs), numsim)
+    
+    # calculate regret, every pull earns the true mean of the pulled arm
+    return true_reward - (selections * mus).sum(axis = 1)
+
+def thompson_normal(true_mus, priors, n, numsim, seed = None, out = None, memory = None, trajectory = None):
     """
     Implementation of the Thompson Sampling algorithm with two arms that both follow a normal distribution. 
     
     Args:
-        true_mus: list with two tuples that includes both means and their respective variances.
+        true_mus: list with two tuples that includes both means and their respective variances, or a list of such 
+            lists to simulate every gap at once.
         priors: list with two tuples that includes both prior means and their respective variances.
         n(int): horizon.
         numsim(int): number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array that receives the regret of every simulation, see thompson_normal_k.
+        memory: memory budget of the simulations, see thompson_normal_k.
+        trajectory: array that receives the cumulative regret of every simulation after every round, see 
+            thompson_normal_k.
         
     Returns:
-        The average regret and regret variance after simulations. 
-    """
-    
-    # list used to store regrets across simulations
-    regrets = []
-    for _ in range(numsim):
-        
-        # store true means and variances
-        mu1, mu1_sig_var = true_mus[0]
-        mu2, mu2_sig_var = true_mus[1]
-        
-        # store prior means and variances
-        mu1_prior, mu1_prior_var = priors[0]
-        mu2_prior, mu2_prior_var = priors[1]
-        
-        # intialize and set individual arm reward and total reward to 0
-        mu1_reward, mu2_reward, total_reward = 0, 0, 0
-        
-        # initialize and set individual arm selections to 0
-        mu1_selections, mu2_selections = 0, 0
-        
-        # find true reward
-        true_reward = max(mu1, mu2) * n 
-        for t in range(n):
-            
-            # sample from prior distributions for both arms
-            mu1_sample = np.random.normal(mu1_prior, mu1_prior_var)
-            mu2_sample = np.random.normal(mu2_prior, mu2_prior_var)
-            
-            # choose which arm to pull
-            if mu1_sample > mu2_sample:
-                mu1_reward = np.random.normal(mu1, mu1_sig_var)
-                total_reward += mu1
-                mu1_prior, mu1_prior_var = posterior_normal(mu1_prior, mu1_prior_var, mu1_sig_var, mu1_reward)
-                mu1_selections += 1
-            else:
-                mu2_reward = np.random.normal(mu2, mu2_sig_var)
-                total_reward += mu2
-                mu2_prior, mu2_prior_var = posterior_normal(mu2_prior, mu2_prior_var, mu2_sig_var, mu2_reward)
-                mu2_selections += 1
-                
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
+        The average regret and regret variance after simulations, or an array with both for every configuration. 
+    """
     
-    # find and return average regret and variance across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    return thompson_normal_k(true_mus, priors, n, numsim, seed = seed, out = out, memory = memory, 
+                             trajectory = trajectory)
 
 def posterior_bernoulli(alpha, beta, reward):
     """
@@ -99,62 +346,93 @@ def posterior_bernoulli(alpha, beta, reward):
     beta = beta + 1 - reward
     return alpha, beta
 
-def thompson_bernoulli(true_mus, priors, n, numsim):
+def thompson_bernoulli(true_mus, priors, n, numsim, seed = None, out = None, memory = None, trajectory = None):
     """
-    Implementation of the Thompson Sampling algorithm with two arms that both follow a bernoulli distribution. 
+    Implementation of the Thompson Sampling algorithm with arms that all follow a bernoulli distribution. Every 
+    simulation of a chunk is stepped together, with the alpha and beta values of each arm kept in arrays of shape 
+    (numsim, arms). Several configurations of arm means are stepped together like in thompson_normal_k.
     
     Args:
-        true_mus: list that includes the means of both arms.
-        priors: list with two tuples that includes both prior alpha and beta values.
+        true_mus: list that includes the means of every arm, or a list of such lists to simulate several 
+            configurations at once.
+        priors: list with a tuple for every arm that includes its prior alpha and beta values.
         n(int): horizon.
         numsim(int): number of simulations.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim,), or (configurations, numsim), that receives the regret of every simulation, 
+            None to skip it.
+        memory: memory budget of the simulations, see thompson_normal_k.
+        trajectory: array of shape (n, numsim), or (n, configurations, numsim), that receives the cumulative regret 
+            of every simulation after every round, see trajectory.create, None to skip it.
         
     Returns:
-        The average regret and regret variance after simulations. 
-    """
-    
-    # list used to store regrets across simulations
-    regrets = []
-    for _ in range(numsim):
-        
-        # store true means
-        mu1, mu2 = true_mus
-        
-        # store prior alpha and beta values
-        alpha1, beta1 = priors[0]
-        alpha2, beta2 = priors[1]
-        
-        # intialize and set individual arm reward and total reward to 0
-        mu1_reward, mu2_reward, total_reward = 0, 0, 0
-        
-        # initialize and set individual arm selections to 0
-        mu1_selections, mu2_selections = 0, 0
-        
-        # find true reward
-        true_reward = max(mu1, mu2) * n
-        for t in range(n):
-            
-            # sample from prior distributions for both arms
-            mu1_sample = np.random.beta(alpha1, beta1)
-            mu2_sample = np.random.beta(alpha2, beta2)
-            
-            # choose which arm to pull
-            if mu1_sample > mu2_sample:
-                mu1_reward = np.random.binomial(n = 1, p = mu1)
-                total_reward += mu1
-                alpha1, beta1 = posterior_bernoulli(alpha1, beta1, mu1_reward)
-                mu1_selections += 1
-            else:
-                mu2_reward = np.random.binomial(n = 1, p = mu2)
-                total_reward += mu2
-                alpha2, beta2 = posterior_bernoulli(alpha2, beta2, mu2_reward)
-                mu2_selections += 1
-                
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    true_mus = np.asarray(true_mus, dtype = float)
+    configs = true_mus.reshape(-1, true_mus.shape[-1])
+    if trajectory is not None:
+        trajectory = trajectory.reshape(n, len(configs), numsim)
+    
+    # simulations run in chunks that fit the memory budget, only the moments of their regrets are kept
+    moments = Moments()
+    per_sim = (8 * _STATE + (crn.STATE if crn.common(seed) else 0)) * configs.size
+    for start, count in budget.split(numsim, per_sim, memory):
+        paths = None if trajectory is None else trajectory[:, :, start:start + count]
+        chunk = _thompson_bernoulli(configs, priors, n, count, rng.Chunk(seed, start), paths, memory)
+        moments.update(chunk.reshape(len(configs), count))
+        if out is not None:
+            out.reshape(len(configs), numsim)[:, start:start + count] = chunk.reshape(len(configs), count)
     
     # find and return average regret and variance across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
\ No newline at end of file
+    if true_mus.ndim < 2:
+        return list(moments.summary()[0])
+    return moments.summary()
+
+def _thompson_bernoulli(configs, priors, n, numsim, seed, trajectory = None, memory = None):
+    """
+    Helper function that steps one chunk of simulations of thompson_bernoulli together, for every configuration of 
+    arm means, and returns the regret of each, and the cumulative regret after every round and the rewards of an 
+    rng.Common seed like _thompson_normal.
+    """
+    
+    rngs = rng.grid(seed, numsim, len(configs))
+    table = crn.table(seed, numsim, configs.shape[1], len(configs), memory)
+    
+    # store true means, one row for every simulation of every configuration
+    mus = np.repeat(configs, numsim, axis = 0)
+    sims = np.arange(len(mus))
+    
+    # store prior alpha and beta values for every simulation
+    alpha = np.tile(np.array([prior[0] for prior in priors], dtype = float), (len(mus), 1))
+    beta = np.tile(np.array([prior[1] for prior in priors], dtype = float), (len(mus), 1))
+    
+    # initialize and set individual arm selections to 0
+    selections = np.zeros(mus.shape)
+    
+    # find true reward
+    true_reward = mus.max(axis = 1) * n
+    if trajectory is not None:
+        best = mus.max(axis = 1)
+        earned = np.zeros(len(mus))
+    for t in range(n):
+        
+        # sample from the posterior distributions of every arm and choose the arm with the highest sample
+        samples = rng.draw(rngs, lambda generator, count, a, b: generator.beta(a, b), alpha, beta)
+        pulled = np.argmax(samples, axis = 1)
+        
+        # observe reward and update the posterior of the pulled arm only
+        if table is None:
+            reward = rng.draw(rngs, lambda generator, count, p: generator.binomial(1, p), mus[sims, pulled])
+        else:
+            reward = (table.uniform(sims, pulled, selections[sims, pulled]) < mus[sims, pulled]).astype(float)
+        alpha[sims, pulled], beta[sims, pulled] = posterior_bernoulli(alpha[sims, pulled], beta[sims, pulled], reward)
+        selections[sims, pulled] += 1
+        if trajectory is not None:
+            earned += mus[sims, pulled]
+            trajectory[t] = (best * (t + 1) - earned).reshape(len(configs), numsim)
+    
+    # calculate regret, every pull earns the true mean of the pulled arm
+    return true_reward - (selections * mus).sum(axis = 1)
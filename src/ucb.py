@@ -1,426 +1,598 @@
 import numpy as np
-import math
+from functools import partial
 
-def ucb_normal(mu1, mu2, n, numsim):
+import budget
+import crn
+from moments import Moments
+import rng
+from kl import klucb_index, klucb_index_table
+
+# bytes one simulation holds per arm, its state and the temporaries of the upper bounds
+_STATE = 128
+
+def _normal(generator, count, mus):
+    """
+    Helper function that draws one reward from a unit variance normal distribution for every given arm mean.
+    """
+    
+    return generator.normal(mus, 1)
+
+def _bernoulli(generator, count, mus):
+    """
+    Helper function that draws one reward from a bernoulli distribution for every given arm mean.
+    """
+    
+    return generator.binomial(n = 1, p = mus)
+
+def _read(table, draw, rows, arms, pulls, mus):
+    """
+    Helper function that reads rewards from a common reward table instead of drawing them, normal rewards for 
+    _normal and bernoulli rewards for _bernoulli.
+    """
+    
+    if draw is _normal:
+        return mus + table.normal(rows, arms, pulls)
+    return (table.uniform(rows, arms, pulls) < mus).astype(float)
+
+def _ucb_bound(empirical, selections, t, n, previous):
+    """
+    Upper confidence bound of UCB(delta) with delta = 1 / n^2.
+    """
+    
+    delta = 1 / n**2
+    return empirical + np.sqrt((2 * np.log(1 / delta)) / selections)
+
+def _asymp_ucb_bound(empirical, selections, t, n, previous):
+    """
+    Upper confidence bound of the asymptotically optimal UCB algorithm in round t.
     """
-    Implementation of the upper confidence bound algorithm with two arms that both follow a normal distribution. 
+    
+    return empirical + np.sqrt((2 * np.log(1 + t * np.log(t)**2)) / selections)
+
+def _moss_bound(empirical, selections, t, n, previous):
+    """
+    Upper confidence bound of the MOSS algorithm.
+    """
+    
+    return empirical + np.sqrt((4 / selections) * np.log(np.maximum(1, n / (2 * selections))))
+
+def _klucb_bound(empirical, selections, t, n, previous, tol, table):
+    """
+    Upper confidence bound of the KL-UCB algorithm in round t, warm started from the bounds of the previous round or 
+    read from a lookup table.
+    """
+    
+    bounds = np.log(1 + t * np.log(np.log(t))) / selections
+    if table is not None:
+        return klucb_index_table(empirical, bounds, table, previous, tol)
+    return klucb_index(empirical, bounds, previous, tol)
+
+def _summary(moments, batched):
+    """
+    Helper function that finds the average regret and regret variance of every configuration.
     
     Args:
-        mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
+        moments: Moments of the regrets, with one entry per configuration.
+        batched (bool): whether several configurations were simulated at once.
+    
+    Returns:
+        The average regret and regret variance, or an array of shape (configurations, 2) with both for every 
+        configuration.
+    """
+    
+    summary = moments.summary()
+    if not batched:
+        return list(summary[0])
+    return summary
+
+def _simulate(mus, n, numsim, bound, draw, first_draw, seed, out = None, memory = None, trajectory = None):
+    """
+    Vectorized engine shared by the UCB family. Instead of running the simulations one after another, every 
+    simulation is stepped together and the state of each arm is kept in arrays of shape (numsim, arms). Simulations 
+    run in chunks of whole random number blocks that fit the memory budget, which leaves every regret unchanged.
+    
+    Several configurations of arm means, for example one for every gap of a plot, can be stepped together as well. 
+    Their simulations are stacked into one array, and configuration g draws from the random number streams of point 
+    g, see rng.grid. With an rng.Common seed, the reward of every pull is read from the common reward table of its 
+    rewards seed, see crn.RewardTable.
+    
+    Args:
+        mus: list with the true mean of every arm, or array of shape (configurations, arms).
         n (int): horizon.
         numsim (int): number of simulations.
+        bound: function of (empirical means, selections, round, horizon, previous upper bounds) that returns the upper 
+            bound of every arm.
+        draw: function of (generator, number of simulations, arm means) that returns one reward for every arm mean.
+        first_draw: function used to draw the reward of the initial pull of each arm.
+        seed: seed of the random number streams of the simulations, see rng.streams.
+        out: array of shape (numsim,), or (configurations, numsim), that receives the regret of every simulation, 
+            None to skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, numsim), or (n, configurations, numsim), that receives the cumulative regret 
+            of every simulation after every round, see trajectory.create, None to skip it.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array with both for every configuration. 
     """
     
-    delta = 1 / n**2
+    mus = np.asarray(mus, dtype = float)
+    configs = mus.reshape(-1, mus.shape[-1])
+    if trajectory is not None:
+        trajectory = trajectory.reshape(n, len(configs), numsim)
     
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # find true reward 
-        true_reward = max(mu1, mu2) * n
-        
-        # initalize upper bounds both arms
-        mu1_upper_bound = 0
-        mu2_upper_bound = 0
-        
-        # pull both arms once and observe reward
-        mu1_reward = np.random.normal(mu1, 1)
-        mu2_reward = np.random.normal(mu2, 1)
-        
-        # increment arm selection by 1 for both arms
-        mu1_selections, mu2_selections = 1, 1
-        
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        for j in range(2, n):
-            
-            # calculate upper confidence bound for both arms
-            mu1_upper_bound = mu1_empirical + math.sqrt((2 * math.log(1 / delta)) / mu1_selections)
-            mu2_upper_bound = mu2_empirical + math.sqrt((2 * math.log(1 / delta)) / mu2_selections)
-            
-            # choose arm with higher upper bound
-            if mu1_upper_bound > mu2_upper_bound:
-                mu1_selections += 1
-                new_sample = np.random.normal(mu1, 1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.normal(mu2, 1)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-        
-        # calculate regret
-        
-        regret = true_reward - total_reward
-        regrets.append(regret)
+    # simulations run in chunks that fit the memory budget, only the moments of their regrets are kept
+    moments = Moments()
+    per_sim = (_STATE + (crn.STATE if crn.common(seed) else 0)) * configs.size
+    for start, count in budget.split(numsim, per_sim, memory):
+        paths = None if trajectory is None else trajectory[:, :, start:start + count]
+        chunk = _simulate_chunk(configs, n, count, bound, draw, first_draw, rng.Chunk(seed, start), paths, memory)
+        moments.update(chunk.reshape(len(configs), count))
+        if out is not None:
+            out.reshape(len(configs), numsim)[:, start:start + count] = chunk.reshape(len(configs), count)
     
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    # find and return average regret and variance across simulations
+    return _summary(moments, mus.ndim > 1)
 
-def ucb_bernoulli(mu1, mu2, n, numsim):
+def _simulate_chunk(configs, n, numsim, bound, draw, first_draw, seed, trajectory = None, memory = None):
     """
-    Implementation of the upper confidence bound algorithm with two arms that both follow a bernoulli distribution. 
+    Helper function that steps one chunk of simulations of _simulate together, for every configuration of arm means, 
+    and returns the regret of each. The cumulative regret after every round goes to trajectory, of shape 
+    (n, configurations, numsim), when it is given.
+    """
+    
+    # one row for every simulation of every configuration
+    mus = np.repeat(configs, numsim, axis = 0)
+    sims = np.arange(len(mus))
+    rngs = rng.grid(seed, numsim, len(configs))
+    table = crn.table(seed, numsim, configs.shape[1], len(configs), memory)
+    
+    # find true reward 
+    true_reward = mus.max(axis = 1) * n
+    
+    # pull every arm once in every simulation and observe reward
+    if table is None:
+        rewards = rng.draw(rngs, first_draw, mus).astype(float)
+    else:
+        rewards = _read(table, first_draw, sims[:, None], np.arange(mus.shape[1]), 0, mus)
+    selections = np.ones(mus.shape)
+    empirical = rewards.copy()
+    
+    # store total reward after pulling every arm once
+    total_reward = rewards.sum(axis = 1)
+    
+    # regret after each initial pull counts its observed reward, and after later pulls the true mean
+    if trajectory is not None:
+        best = mus.max(axis = 1)
+        for j in range(mus.shape[1]):
+            trajectory[j] = (best * (j + 1) - rewards[:, :j + 1].sum(axis = 1)).reshape(len(configs), numsim)
+        earned = total_reward.copy()
+    
+    upper_bound = None
+    for j in range(mus.shape[1], n):
+        
+        # calculate upper confidence bound for every arm and choose the arm with the highest one
+        upper_bound = bound(empirical, selections, j, n, upper_bound)
+        pulled = np.argmax(upper_bound, axis = 1)
+        
+        # only the statistics of the pulled arm change
+        selections[sims, pulled] += 1
+        if table is None:
+            rewards[sims, pulled] += rng.draw(rngs, draw, mus[sims, pulled])
+        else:
+            rewards[sims, pulled] += _read(table, draw, sims, pulled, selections[sims, pulled] - 1, mus[sims, pulled])
+        empirical[sims, pulled] = rewards[sims, pulled] / selections[sims, pulled]
+        if trajectory is not None:
+            earned += mus[sims, pulled]
+            trajectory[j] = (best * (j + 1) - earned).reshape(len(configs), numsim)
+    
+    # every pull after the initial ones earns the true mean of the pulled arm
+    total_reward += ((selections - 1) * mus).sum(axis = 1)
+    
+    # calculate regret of every simulation
+    return true_reward - total_reward
+
+def _simulate_skip(mus, n, numsim, bound, draw, first_draw, seed, out = None, memory = None, min_block = 16,
+                   max_block = 2**16, trajectory = None):
+    """
+    Skip-ahead engine for the UCB family, for bounds where an arm's index only depends on its own statistics and the 
+    round. While the same arm keeps the highest upper bound, a block of its rewards is drawn ahead, its running upper 
+    bound is computed for the whole block at once and the simulation jumps straight to the first round where another 
+    arm overtakes it. Rewards drawn beyond that round are discarded, so the results match _simulate in distribution.
+    
+    Long runs of the same arm make this much faster than stepping every round, which makes horizons in the millions 
+    feasible. When the arms keep swapping, as with equal means, every jump is short and _simulate is faster.
     
     Args:
-        mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
+        mus: list with the true mean of every arm, or array of shape (configurations, arms).
         n (int): horizon.
         numsim (int): number of simulations.
+        bound: function of (empirical means, selections, round, horizon, previous upper bounds) that returns the upper 
+            bound of every arm.
+        draw: function of (generator, number of simulations, arm means) that returns one reward for every arm mean.
+        first_draw: function used to draw the reward of the initial pull of each arm.
+        seed: seed of the random number streams of the simulations, see rng.streams.
+        out: array of shape (numsim,), or (configurations, numsim), that receives the regret of every simulation, 
+            None to skip it.
+        memory: accepted like in _simulate, a simulation never holds more than max_block rounds at once.
+        min_block (int): number of rewards drawn ahead after the leading arm changes.
+        max_block (int): largest number of rewards drawn ahead, the block doubles while the same arm keeps leading.
+        trajectory: not supported, rounds are skipped so there is no regret after every round to record.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array with both for every configuration. 
     """
     
-    delta = 1 / n**2
+    if trajectory is not None:
+        raise ValueError('the skip-ahead engine does not record trajectories')
+    if crn.common(seed):
+        raise ValueError('the skip-ahead engine does not read common rewards')
+    mus = np.asarray(mus, dtype = float)
+    configs = mus.reshape(-1, mus.shape[-1])
     
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # find true reward 
-        true_reward = max(mu1, mu2) * n
-        
-        # initalize upper bounds both arms
-        mu1_upper_bound = 0
-        mu2_upper_bound = 0
-        
-        # pull both arms once and observe reward
-        mu1_reward = np.random.normal(mu1, 1)
-        mu2_reward = np.random.normal(mu2, 1)
-        
-        # increment arm selection by 1 for both arms
-        mu1_selections, mu2_selections = 1, 1
-        
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        for j in range(2, n):
-            
-            # calculate upper confidence bound for both arms
-            mu1_upper_bound = mu1_empirical + math.sqrt((2 * math.log(1 / delta)) / mu1_selections)
-            mu2_upper_bound = mu2_empirical + math.sqrt((2 * math.log(1 / delta)) / mu2_selections)
-            
-            # choose arm with higher upper bound
-            if mu1_upper_bound > mu2_upper_bound:
-                mu1_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu2)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-        
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    # simulations run one after another, each block of them drawing from its own stream and belonging to one 
+    # configuration
+    moments = [Moments() for _ in configs]
+    for first, last, generator in rng.grid(seed, numsim, len(configs)):
+        g, i = divmod(first, numsim)
+        regrets = np.array([_skip_regret(configs[g], n, bound, draw, first_draw, generator, min_block, max_block) 
+                            for _ in range(first, last)])
+        moments[g].update(regrets)
+        if out is not None:
+            out.reshape(len(configs), numsim)[g, i:i + len(regrets)] = regrets
+    
+    # find and return average regret and variance across simulations
+    moments = Moments(numsim, np.array([m.mean for m in moments]), np.array([m.m2 for m in moments]))
+    return _summary(moments, mus.ndim > 1)
+
+def _skip_regret(mus, n, bound, draw, first_draw, generator, min_block, max_block):
+    """
+    Helper function that runs one simulation of the skip-ahead engine and returns its regret.
+    """
+    
+    # find true reward 
+    true_reward = mus.max() * n
+    
+    # pull every arm once and observe reward
+    rewards = first_draw(generator, 1, mus.copy()).astype(float)
+    selections = np.ones(mus.size)
+    total_reward = rewards.sum()
+    
+    t = mus.size
+    block = min_block
+    while t < n:
+        
+        # the arm with the highest upper bound leads until another arm overtakes it
+        empirical = rewards / selections
+        leader = np.argmax(bound(empirical, selections, t, n, None))
+        
+        # running upper bound of the leader if it keeps getting pulled for the whole block
+        size = min(block, n - t)
+        rounds = np.arange(t, t + size)
+        samples = draw(generator, 1, np.full(size, mus[leader]))
+        leader_rewards = rewards[leader] + np.concatenate([[0], np.cumsum(samples[:-1])])
+        leader_selections = selections[leader] + np.arange(size)
+        leader_bound = bound(leader_rewards / leader_selections, leader_selections, rounds, n, None)
+        
+        # highest upper bound of the arms before and after the leader, ties go to the lower arm like argmax
+        others = bound(empirical[None, :], selections[None, :], rounds[:, None], n, None)
+        before = others[:, :leader].max(axis = 1, initial = -np.inf)
+        after = others[:, leader + 1:].max(axis = 1, initial = -np.inf)
+        leads = (leader_bound > before) & (leader_bound >= after)
+        
+        # jump to the first round where the leader is overtaken
+        pulls = size if leads.all() else max(1, np.argmin(leads))
+        selections[leader] += pulls
+        rewards[leader] += samples[:pulls].sum()
+        t += pulls
+        block = min(2 * block, max_block) if pulls == size else min_block
+    
+    # every pull after the initial ones earns the true mean of the pulled arm
+    return true_reward - total_reward - (selections - 1) @ mus
 
-def asymp_ucb_normal(mu1, mu2, n, numsim):
+def ucb_normal_k(mus, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                 trajectory = None):
     """
-    Implementation of the asymptotically optimal upper confidence bound algorithm with two arms that both follow a 
-    normal distribution. 
+    Implementation of the upper confidence bound algorithm with any number of arms that all follow a normal
+    distribution.
     
     Args:
-        mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
         n (int): horizon.
         numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, None to use fresh entropy, or an rng.Common to read the rewards 
+            from a common reward table.
+        out: array of shape (numsim,), or (configurations, numsim), that receives the regret of every simulation, 
+            None to skip it.
+        memory: memory budget of the simulations, see budget.limit.
+        trajectory: array of shape (n, numsim), or (n, configurations, numsim), that receives the cumulative regret 
+            of every simulation after every round, see trajectory.create, None to skip it. Only the round by round 
+            engine records it.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
     """
     
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # find true reward 
-        true_reward = max(mu1, mu2) * n
-        
-        # initalize upper bounds both arms
-        mu1_upper_bound = 0
-        mu2_upper_bound = 0
-        
-        # pull both arms once and observe reward
-        mu1_reward = np.random.normal(mu1, 1)
-        mu2_reward = np.random.normal(mu2, 1)
-        
-        # increment arm selection by 1 for both arms
-        mu1_selections, mu2_selections = 1, 1
-        
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        for j in range(2, n):
-            
-            # calculate upper confidence bound for both arms
-            mu1_upper_bound = mu1_empirical + np.sqrt((2 * np.log(1 + j * np.log(j)**2)) / mu1_selections)
-            mu2_upper_bound = mu2_empirical + np.sqrt((2 * np.log(1 + j * np.log(j)**2)) / mu2_selections)
-            
-            # choose arm with higher upper bound
-            if mu1_upper_bound > mu2_upper_bound:
-                mu1_selections += 1
-                new_sample = np.random.normal(mu1, 1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.normal(mu2, 1)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-        
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    engine = _simulate_skip if skip else _simulate
+    return engine(mus, n, numsim, _ucb_bound, _normal, _normal, seed, out, memory, trajectory = trajectory)
 
-def moss_normal(mu1, mu2, n, numsim):
+def ucb_bernoulli_k(mus, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                    trajectory = None):
     """
-    Implementation of the MOSS algorithm with two arms that both follow a normal distribution. 
+    Implementation of the upper confidence bound algorithm with any number of arms that all follow a bernoulli
+    distribution. The initial pull of each arm is drawn from a normal distribution.
     
     Args:
-        mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
         n (int): horizon.
         numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
     """
     
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # find true reward 
-        true_reward = max(mu1, mu2) * n
-        
-        # initalize upper bounds both arms
-        mu1_upper_bound = 0
-        mu2_upper_bound = 0
-        
-        # pull both arms once and observe reward
-        mu1_reward = np.random.normal(mu1, 1)
-        mu2_reward = np.random.normal(mu2, 1)
-        
-        # increment arm selection by 1 for both arms
-        mu1_selections, mu2_selections = 1, 1
-        
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        for j in range(2, n):
-            
-            # calculate upper confidence bound for both arms
-            mu1_upper_bound = mu1_empirical + np.sqrt(((4 / mu1_selections) * np.log(max(1, n / (2 * mu1_selections)))))
-            mu2_upper_bound = mu2_empirical + np.sqrt(((4 / mu2_selections) * np.log(max(1, n / (2 * mu2_selections)))))
-            
-            # choose arm with higher upper bound
-            if mu1_upper_bound > mu2_upper_bound:
-                mu1_selections += 1
-                new_sample = np.random.normal(mu1, 1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.normal(mu2, 1)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-        
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    engine = _simulate_skip if skip else _simulate
+    return engine(mus, n, numsim, _ucb_bound, _bernoulli, _normal, seed, out, memory, trajectory = trajectory)
 
-def moss_bernoulli(mu1, mu2, n, numsim):
+def asymp_ucb_normal_k(mus, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                       trajectory = None):
     """
-    Implementation of the MOSS algorithm with two arms that both follow a bernoulli distribution. 
+    Implementation of the asymptotically optimal upper confidence bound algorithm with any number of arms that all
+    follow a normal distribution.
+    
+    Args:
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    engine = _simulate_skip if skip else _simulate
+    return engine(mus, n, numsim, _asymp_ucb_bound, _normal, _normal, seed, out, memory, trajectory = trajectory)
+
+def moss_normal_k(mus, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                  trajectory = None):
+    """
+    Implementation of the MOSS algorithm with any number of arms that all follow a normal distribution.
+    
+    Args:
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    engine = _simulate_skip if skip else _simulate
+    return engine(mus, n, numsim, _moss_bound, _normal, _normal, seed, out, memory, trajectory = trajectory)
+
+def moss_bernoulli_k(mus, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                     trajectory = None):
+    """
+    Implementation of the MOSS algorithm with any number of arms that all follow a bernoulli distribution. The
+    initial pull of each arm is drawn from a normal distribution.
+    
+    Args:
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    engine = _simulate_skip if skip else _simulate
+    return engine(mus, n, numsim, _moss_bound, _bernoulli, _normal, seed, out, memory, trajectory = trajectory)
+
+def klucb_bernoulli_k(mus, n, numsim, tol = 1e-6, table = None, seed = None, out = None, memory = None, 
+                      trajectory = None):
+    """
+    Implementation of the KL-UCB algorithm with any number of arms that all follow a bernoulli distribution.
+    
+    Args:
+        mus: list with the true mean of every arm, or array of shape (configurations, arms) to simulate several 
+            configurations at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        tol (float): tolerance of the KL-UCB index solver.
+        table: optional lookup table from kl.kl_table used instead of solving every index.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    bound = partial(_klucb_bound, tol = tol, table = table)
+    return _simulate(mus, n, numsim, bound, _bernoulli, _bernoulli, seed, out, memory, trajectory)
+
+def _pair(mu1, mu2):
+    """
+    Helper function that stacks the means of two arms, where either may be an array of configurations.
+    """
+    
+    return np.stack(np.broadcast_arrays(mu1, mu2), axis = -1)
+
+def ucb_normal(mu1, mu2, n, numsim, skip = False, seed = None, out = None, memory = None, 
+               trajectory = None):
+    """
+    Implementation of the upper confidence bound algorithm with two arms that both follow a normal distribution.
     
     Args:
         mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
-        n (int): horizon 
-        numsim(int): number of simulations
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
     """
     
-    # list used to store the regrets across simulations
-    regrets = []
-    for i in range(numsim):
-        
-        # find true reward 
-        true_reward = max(mu1, mu2) * n
-        
-        # initalize upper bounds both arms
-        mu1_upper_bound = 0
-        mu2_upper_bound = 0
-        
-        # pull both arms once and observe reward
-        mu1_reward = np.random.normal(mu1, 1)
-        mu2_reward = np.random.normal(mu2, 1)
-        
-        # increment arm selection by 1 for both arms
-        mu1_selections, mu2_selections = 1, 1
-        
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        for j in range(2, n):
-            
-            # calculate upper confidence bound for both arms
-            mu1_upper_bound = mu1_empirical + np.sqrt(((4 / mu1_selections) * np.log(max(1, n / (2 * mu1_selections)))))
-            mu2_upper_bound = mu2_empirical + np.sqrt(((4 / mu2_selections) * np.log(max(1, n / (2 * mu2_selections)))))
-            
-            # choose arm with higher upper bound
-            if mu1_upper_bound > mu2_upper_bound:
-                mu1_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu2)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-        
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-    
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
+    return ucb_normal_k(_pair(mu1, mu2), n, numsim, skip, seed = seed, out = out, memory = memory, 
+                        trajectory = trajectory)
 
-def klucb_bernoulli(mu1, mu2, n, numsim):
+def ucb_bernoulli(mu1, mu2, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                  trajectory = None):
     """
-    Implementation of the KL-UCB algorithm with two arms that both follow a bernoulli distribution. 
+    Implementation of the upper confidence bound algorithm with two arms that both follow a bernoulli distribution.
+    The initial pull of each arm is drawn from a normal distribution.
     
     Args:
         mu1 (int): the true mean of the first arm.
-        mu2 (int): the true mean of the second arm.
-        n (int): horizon 
-        numsim(int): number of simulations
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
     
     Returns:
-        The average regret and regret variance after simulations. 
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
     """
     
-    # list used to store regrets across simulations
-    regrets = []
-    for _ in range(100):
-        
-        # initalize upper bounds for both arms
-        mu1_upper_bound, mu2_upper_bound = 0, 0
-        
-        # pull both arms and observe rewards
-        mu1_reward = np.random.binomial(n=1,p=mu1)
-        mu2_reward = np.random.binomial(n=1,p=mu2)
-        
-        # increment arm selection for both arms
-        mu1_selections, mu2_selections = 1, 1
+    return ucb_bernoulli_k(_pair(mu1, mu2), n, numsim, skip, seed = seed, out = out, memory = memory, 
+                           trajectory = trajectory)
 
-        # find empirical means for both arms after pulling both
-        mu1_empirical = mu1_reward / mu1_selections
-        mu2_empirical = mu2_reward / mu2_selections
-        
-        # store total reward after pulling both arms once each
-        total_reward = mu1_reward + mu2_reward
-        
-        # find true reward
-        true_reward = max(mu1, mu2) * n
+def asymp_ucb_normal(mu1, mu2, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                     trajectory = None):
+    """
+    Implementation of the asymptotically optimal upper confidence bound algorithm with two arms that both follow a
+    normal distribution.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    return asymp_ucb_normal_k(_pair(mu1, mu2), n, numsim, skip, seed = seed, out = out, memory = memory, 
+                              trajectory = trajectory)
 
-        for t in range(2, n):
-            mu1_bound = np.log(1 + t * np.log(np.log(t))) / mu1_selections
-            mu2_bound = np.log(1 + t * np.log(np.log(t))) / mu2_selections
-            bounds = np.array([mu1_bound, mu2_bound])
+def moss_normal(mu1, mu2, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                trajectory = None):
+    """
+    Implementation of the MOSS algorithm with two arms that both follow a normal distribution.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    return moss_normal_k(_pair(mu1, mu2), n, numsim, skip, seed = seed, out = out, memory = memory, 
+                         trajectory = trajectory)
 
-            # use binary search to find and compute kl-divergence < bound
-            p = np.array([mu1_empirical, mu2_empirical])
-            qmin = p
-            qmax = np.ones(p.size)
-            for _ in range(16):  # Error bounded by 2^-16.
-                q = (qmax + qmin) / 2
-                ndx = (np.where(p > 0, p * np.log(p / q), 0) + np.where(p < 1, (1 - p) * np.log((1 - p) / (1 - q)), 0)) < bounds
-                qmin[ndx] = q[ndx]
-                qmax[~ndx] = q[~ndx]
+def moss_bernoulli(mu1, mu2, n, numsim, skip = False, seed = None, out = None, memory = None, 
+                   trajectory = None):
+    """
+    Implementation of the MOSS algorithm with two arms that both follow a bernoulli distribution. The initial pull
+    of each arm is drawn from a normal distribution.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        skip (bool): use the skip-ahead engine, which is faster for long horizons.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    return moss_bernoulli_k(_pair(mu1, mu2), n, numsim, skip, seed = seed, out = out, memory = memory, 
+                            trajectory = trajectory)
 
-            chosen = np.argmax(q)
-            
-            # choose arm with higher bound
-            if chosen == 0:
-                mu1_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu1)
-                mu1_reward += new_sample
-                total_reward += mu1
-                mu1_empirical = mu1_reward / mu1_selections
-            else:
-                mu2_selections += 1
-                new_sample = np.random.binomial(n = 1, p = mu2)
-                mu2_reward += new_sample
-                total_reward += mu2
-                mu2_empirical = mu2_reward / mu2_selections
-                
-        # calculate regret
-        regret = true_reward - total_reward
-        regrets.append(regret)
-        
-    # find and return average regret across simulations
-    expected_regret = sum(regrets) / len(regrets)
-    variance = np.var(regrets)
-    return [expected_regret, variance]
\ No newline at end of file
+def klucb_bernoulli(mu1, mu2, n, numsim, tol = 1e-6, table = None, seed = None, out = None, memory = None, 
+                    trajectory = None):
+    """
+    Implementation of the KL-UCB algorithm with two arms that both follow a bernoulli distribution.
+    
+    Args:
+        mu1 (int): the true mean of the first arm.
+        mu2 (int): the true mean of the second arm, or an array of them to simulate every gap at once.
+        n (int): horizon.
+        numsim (int): number of simulations.
+        tol (float): tolerance of the KL-UCB index solver.
+        table: optional lookup table from kl.kl_table used instead of solving every index.
+        seed: seed of the random number streams, see ucb_normal_k.
+        out: array that receives the regret of every simulation, see ucb_normal_k.
+        memory: memory budget of the simulations, see ucb_normal_k.
+        trajectory: array that receives the cumulative regret after every round, see ucb_normal_k.
+    
+    Returns:
+        The average regret and regret variance after simulations, or an array of shape (configurations, 2) with both 
+        for every configuration.
+    """
+    
+    return klucb_bernoulli_k(_pair(mu1, mu2), n, numsim, tol, table, seed = seed, out = out, memory = memory, 
+                             trajectory = trajectory)
\ No newline at end of file